@@ -1,41 +1,182 @@
 import random
-from copy import copy
+from collections import Counter
+from types import MappingProxyType
 
-OK = 'ok'
-NO_GOOD = 'no_good'
-CONNECTION_REQUEST = 'connection_request'
-CONNECTION_SUCCESSFUL = 'connection_successful'
-INDIRECT = 'indirect'
-NO_SOLUTION = 'no_solution'
+from messages import OK, NO_GOOD, CONNECTION_REQUEST, CONNECTION_SUCCESSFUL, INDIRECT, NO_SOLUTION, Envelope, Route
+from nogood_store import NogoodStore, OLDEST
+from outbox import coalesce_ok_messages
+import tracing
+from tracing import INFO, DEBUG
+
+# Most agents never need some of their containers, so they all start out sharing these read only empty ones and only
+# get their own on the first write
+NO_INDIRECT_NEIGHBORS = MappingProxyType({})
+NO_CONNECTION_REQUESTS = frozenset()
+NO_STATS = Counter()
+NO_MESSAGES = ()
+
+# Agents with the same options share one read only table of their bits
+option_bit_tables = {}
+
+
+def option_bit_table(options):
+    key = tuple(options)
+    table = option_bit_tables.get(key)
+    if table is None:
+        table = option_bit_tables[key] = MappingProxyType({number: 1 << i for i, number in enumerate(options)})
+    return table
 
 
 class Agent:
-    def __init__(self, index, options, verbose=False, initial_assignment=None):
+    # Agents are kept small, since a run can have millions of them: no __dict__, containers shared until they are
+    # first written to, and a mailbox that is emptied in place rather than replaced
+    __slots__ = ('index', 'options', 'neighbors', 'neighbor_map', 'neighbor_indices', 'indirect_neighbors', 'number',
+                 'agent_view', 'option_bits', 'full_mask', 'forbidden_counts', 'forbidden_mask', 'no_goods',
+                 'messages', 'new_messages', 'no_sol', 'verbose', 'tracer', 'trace_level', 'initial_assignment',
+                 'connection_requests', 'minimize_no_goods', 'coalesce_ok', 'router', 'rank', 'ranks', 'stats',
+                 'constraint_checks')
+
+    def __init__(self, index, options, verbose=False, initial_assignment=None, minimize_no_goods=False,
+                 forget_no_goods=False, max_no_goods=None, no_good_eviction=OLDEST, coalesce_ok=False, tracer=None):
         self.index = index
         self.options = options
-        self.neighbors = []
-        self.indirect_neighbors = []
+        self.neighbors = ()
+        self.neighbor_map = {}
+        self.neighbor_indices = self.neighbor_map.keys()
+        self.indirect_neighbors = NO_INDIRECT_NEIGHBORS
         self.number = None
-        self.agent_view = []
-        self.no_goods = []
+        self.agent_view = {}
+        # Values are also tracked as bits in the order of options: forbidden_counts[i] is how many neighbors in the
+        # agent_view hold options[i] and forbidden_mask has bit i set while that count is positive
+        self.option_bits = option_bit_table(options)
+        self.full_mask = (1 << len(options)) - 1
+        self.forbidden_counts = [0] * len(options)
+        self.forbidden_mask = 0
+        self.no_goods = NogoodStore(index, forget_obsolete=forget_no_goods, max_size=max_no_goods,
+                                    eviction=no_good_eviction, option_bits=self.option_bits)
         self.messages = []
-        self.new_messages = []
+        self.new_messages = NO_MESSAGES
         self.no_sol = False
         self.verbose = verbose
+        # verbose is kept as a shorthand for printing every event
+        if tracer is None:
+            tracer = tracing.Tracer(DEBUG) if verbose else tracing.DISABLED
+        self.tracer = tracer
+        self.trace_level = tracer.level
         self.initial_assignment = initial_assignment
-        self.connection_requests = []
+        self.connection_requests = NO_CONNECTION_REQUESTS
+        self.minimize_no_goods = minimize_no_goods
+        self.coalesce_ok = coalesce_ok
+        self.router = None
+        # ABT priorities: rank is this agent's position in the priority ordering, lower ranks having higher priority,
+        # and ranks the shared table of every agent's rank. Without a table the ranks are the indices
+        self.rank = index
+        self.ranks = None
+        self.stats = NO_STATS
+        self.constraint_checks = 0
+
+    def count(self, key, amount=1):
+        if amount:
+            if self.stats is NO_STATS:
+                self.stats = Counter()
+            self.stats[key] += amount
 
+    def set_tracer(self, tracer):
+        self.tracer = tracer
+        self.trace_level = tracer.level
+
+    def set_router(self, router):
+        self.router = router
+
+    def set_ranks(self, ranks):
+        self.ranks = ranks
+        self.rank = ranks[self.index]
+
+    def rank_of(self, index):
+        if self.ranks is None:
+            return index
+        return self.ranks[index]
+
+    # neighbors and neighbor_map are the agents this one can message directly, neighbor_indices the ones it must not
+    # share a value with. They only differ once a constraint was removed, since links in ABT are never removed, so
+    # until then neighbor_indices is a view of neighbor_map rather than a set of its own
     def set_neighbors(self, neighbors):
-        self.neighbors = neighbors
+        self.neighbors = tuple(neighbors)
+        self.neighbor_map = {neighbor.index: neighbor for neighbor in neighbors}
+        self.neighbor_indices = self.neighbor_map.keys()
+        self.forbidden_counts = [0] * len(self.options)
+        self.forbidden_mask = 0
+        for index, number in self.agent_view.items():
+            if index in self.neighbor_indices:
+                self.forbid(number, 1)
+
+    def add_constraint(self, neighbor):
+        constrained = neighbor.index in self.neighbor_indices
+        if neighbor.index not in self.neighbor_map:
+            self.neighbors += (neighbor,)
+            self.neighbor_map[neighbor.index] = neighbor
+        if not constrained:
+            if isinstance(self.neighbor_indices, set):
+                self.neighbor_indices.add(neighbor.index)
+            number = self.agent_view.get(neighbor.index)
+            if number is not None:
+                self.forbid(number, 1)
+
+    def remove_constraint(self, index):
+        if index in self.neighbor_indices:
+            if not isinstance(self.neighbor_indices, set):
+                self.neighbor_indices = set(self.neighbor_indices)
+            self.neighbor_indices.discard(index)
+            number = self.agent_view.get(index)
+            if number is not None:
+                self.forbid(number, -1)
+
+    def set_options(self, options):
+        self.options = options
+        if self.initial_assignment not in options:
+            self.initial_assignment = None
+        self.option_bits = option_bit_table(options)
+        self.full_mask = (1 << len(options)) - 1
+        self.forbidden_counts = [0] * len(options)
+        self.forbidden_mask = 0
+        for index, number in self.agent_view.items():
+            if index in self.neighbor_indices:
+                self.forbid(number, 1)
+        self.no_goods.update_option_bits(self.option_bits)
+
+    def revise(self):
+        # Checks the current value again after the agent's constraints or options changed rather than its agent_view
+        self.new_messages = []
+        if self.number is not None and not self.no_sol:
+            self.check_agent_view()
+        return self.take_messages()
+
+    def resume(self):
+        # Takes part again after a no solution that a change to the problem may have made wrong. Messages were ignored
+        # meanwhile, so the agent drops the NO_SOLUTION messages still waiting, announces its value again and forgets
+        # connection requests that got no answer
+        self.new_messages = []
+        self.no_sol = False
+        self.messages = [message for message in self.messages if message[0] != NO_SOLUTION]
+        self.connection_requests = self.connection_requests & self.indirect_neighbors.keys()
+        if self.number is not None:
+            self.send_value()
+        return self.take_messages()
+
+    def take_messages(self):
+        # The agent does not hold on to what it sent once the caller has it
+        new_messages = self.new_messages
+        self.new_messages = NO_MESSAGES
+        return new_messages
 
     def message(self, message):
-        self.print_info(message)
+        if self.trace_level >= DEBUG:
+            self.tracer.emit(tracing.RECEIVED, agent=self.index, message=message)
         self.messages.append(message)
 
     def process_messages(self):
-        self.print_info('=' * 100)
-        self.print_info(f'Processing Agent {self.index}')
-        self.print_info('=' * 100)
+        if self.trace_level >= DEBUG:
+            self.tracer.emit(tracing.ACTIVATED, agent=self.index)
 
         self.new_messages = []
 
@@ -45,48 +186,48 @@ class Agent:
                 self.number = self.initial_assignment
             else:
                 self.number = random.choice(self.options)
-            self.print_info(f'Agent {self.index} assigned itself {self.number}')
+            if self.trace_level >= INFO:
+                self.tracer.emit(tracing.INITIAL_VALUE, agent=self.index, number=self.number)
             # Send all neighbors with lower priority current number
             for neighbor in self.neighbors:
-                if neighbor.index > self.index:
-                    self.print_info(f'Sent agent {neighbor.index} message {(self.index, self.number)}')
-                    self.new_messages.append(
-                        {'source': self, 'agent': neighbor, 'message': (OK, (self.index, self.number))})
+                if neighbor.rank > self.rank:
+                    if self.trace_level >= DEBUG:
+                        self.tracer.emit(tracing.OK_SENT, agent=self.index, target=neighbor.index, number=self.number)
+                    self.new_messages.append(Envelope(self, neighbor, (OK, (self.index, self.number))))
 
         # Process received messages
-        for message_type, message_content in self.messages:
+        for message in self.messages:
+            message_type, message_content = message
             if self.no_sol:
                 continue
             # Process Ok? Messages
             if message_type == OK:
-                self.print_info(f'Agent {self.index} processing ok message {message_content}')
                 agent_index, updated_number = message_content
-                updated = False
-                for i in range(len(self.agent_view)):
-                    if self.agent_view[i][0] == agent_index:
-                        self.agent_view[i] = (agent_index, updated_number)
-                        updated = True
-                        break
-                if not updated:
-                    self.agent_view.append((agent_index, updated_number))
-                self.print_info(f'Agent {self.index} agent_view is now {self.agent_view}')
+                self.set_view(agent_index, updated_number)
+                if self.trace_level >= DEBUG:
+                    self.tracer.emit(tracing.OK_RECEIVED, agent=self.index, source=agent_index, number=updated_number,
+                                     agent_view=self.agent_view)
                 self.check_agent_view()
             elif message_type == NO_GOOD:
                 source_index, no_good = message_content
-                self.print_info(f'Agent {self.index} processing no_good {no_good}')
-                self.no_goods.append(no_good)
-                new_connections = set(x[0] for x in no_good) - (set(
-                    x[0] for x in self.indirect_neighbors).union(set(x.index for x in self.neighbors)).union(
-                    {self.index})).union(set(self.connection_requests))
+                if self.trace_level >= DEBUG:
+                    self.tracer.emit(tracing.NO_GOOD_RECEIVED, agent=self.index, source=source_index, no_good=no_good)
+                self.no_goods.add(no_good, self.agent_view)
+                new_connections = set(x[0] for x in no_good if x[0] != self.index and x[0] not in self.neighbor_map
+                                      and x[0] not in self.indirect_neighbors and x[0] not in self.connection_requests)
+                self.count('connection_requests_started', len(new_connections))
                 for index in new_connections:
                     if len(self.neighbors):
-                        self.print_info(f'Agent {self.index} sending connection_request to Agent {index} through Agent '
-                                        f'{self.neighbors[0].index}')
-                        self.new_messages.append({'source': self, 'agent': self.neighbors[0],
-                                                  'message': (
-                                                      CONNECTION_REQUEST, (self.index, index, [self.index], [self.index]
-                                                                           ))})
-                        self.connection_requests.append(index)
+                        agent = self.connection_hop(index)
+                        if self.trace_level >= INFO:
+                            self.tracer.emit(tracing.CONNECTION_REQUEST_SENT, agent=self.index, target=index,
+                                             hop=agent.index)
+                        self.new_messages.append(Envelope(self, agent, (CONNECTION_REQUEST,
+                                                                        (self.index, index, [self.index],
+                                                                         [self.index]))))
+                        if not isinstance(self.connection_requests, set):
+                            self.connection_requests = set()
+                        self.connection_requests.add(index)
                     else:
                         print('ERROR: Agent has no neighbors')
                         exit()
@@ -98,14 +239,14 @@ class Agent:
                     print('ERROR: Source Index is not a neighbor')
                     exit()
             elif message_type == INDIRECT:
-                path, message = message_content
-                self.send_indirect_path(path, message)
+                self.forward(message)
             elif message_type == CONNECTION_REQUEST:
                 source_index, target_index, path, visited = message_content
-                self.print_info(
-                    f'Agent {self.index} processing connection_request - target={target_index}, source={source_index}, path={path}, visited={visited}, neighbors={[n.index for n in self.neighbors]}')
+                if self.trace_level >= DEBUG:
+                    self.tracer.emit(tracing.CONNECTION_REQUEST_RECEIVED, agent=self.index, source=source_index,
+                                     target=target_index, path=path, visited=visited)
                 if self.index == target_index:
-                    self.indirect_neighbors.append((source_index, path[::-1]))
+                    self.add_indirect_neighbor(source_index, tuple(path[::-1]))
                     self.send_indirect_path(path[::-1], (CONNECTION_SUCCESSFUL,
                                                          [*path[1:], self.index]))
                     self.send_indirect_path(path[::-1], (OK, (self.index, self.number)))
@@ -114,45 +255,48 @@ class Agent:
                     print(f'ERROR: Connection Request Failed, '
                           f'No Path between Agent {source_index} and Agent {target_index}')
                     exit()
+                if self.router is not None:
+                    agent = self.connection_hop(target_index)
+                    if self.trace_level >= DEBUG:
+                        self.tracer.emit(tracing.CONNECTION_REQUEST_FORWARDED, agent=self.index, target=target_index,
+                                         hop=agent.index, path=path, visited=visited)
+                    self.new_messages.append(Envelope(self, agent, (CONNECTION_REQUEST,
+                                                                    (source_index, target_index, [*path, self.index],
+                                                                     [*visited, self.index]))))
+                    continue
                 sent = False
-                for agent in self.neighbors:
-                    if agent.index == target_index:
-                        self.print_info(
-                            f'Agent {self.index} transferring connection_request with target Agent {target_index}'
-                            f' to Agent {agent.index} - path={path}, visited={visited}, neighbors={[n.index for n in self.neighbors]}')
-                        self.new_messages.append({'source': self, 'agent': agent,
-                                                  'message': (
-                                                      CONNECTION_REQUEST,
-                                                      (source_index, target_index, [*path, self.index],
-                                                       [*visited, self.index]))})
-                        sent = True
+                agent = self.neighbor_map.get(target_index)
+                if agent is not None:
+                    if self.trace_level >= DEBUG:
+                        self.tracer.emit(tracing.CONNECTION_REQUEST_FORWARDED, agent=self.index, target=target_index,
+                                         hop=agent.index, path=path, visited=visited)
+                    self.new_messages.append(Envelope(self, agent, (CONNECTION_REQUEST,
+                                                                    (source_index, target_index, [*path, self.index],
+                                                                     [*visited, self.index]))))
+                    sent = True
                 if not sent:
-                    for index, neighbor_path in self.indirect_neighbors:
-                        if index == target_index:
-                            self.send_indirect_path(neighbor_path, (CONNECTION_REQUEST,
-                                                                    (source_index, target_index,
-                                                                     [*path, self.index, *(neighbor_path[:-1])],
-                                                                     [*visited, self.index, *(neighbor_path[:-1])])))
-                            sent = True
+                    for neighbor_path in self.indirect_neighbors.get(target_index, ()):
+                        self.send_indirect_path(neighbor_path, (CONNECTION_REQUEST,
+                                                                (source_index, target_index,
+                                                                 [*path, self.index, *(neighbor_path[:-1])],
+                                                                 [*visited, self.index, *(neighbor_path[:-1])])))
+                        sent = True
                 if not sent:
                     for agent in self.neighbors:
                         if agent.index not in visited:
-                            self.print_info(
-                                f'Agent {self.index} transferring connection_request with target Agent {target_index}'
-                                f' to Agent {agent.index} - path={path}, visited={visited}, neighbors={[n.index for n in self.neighbors]}')
-                            self.new_messages.append({'source': self, 'agent': agent,
-                                                      'message': (
-                                                          CONNECTION_REQUEST,
-                                                          (source_index, target_index, [*path, self.index],
-                                                           [*visited, self.index]))})
+                            if self.trace_level >= DEBUG:
+                                self.tracer.emit(tracing.CONNECTION_REQUEST_FORWARDED, agent=self.index,
+                                                 target=target_index, hop=agent.index, path=path, visited=visited)
+                            self.new_messages.append(Envelope(self, agent, (CONNECTION_REQUEST,
+                                                                            (source_index, target_index, [*path, self.index],
+                                                                             [*visited, self.index]))))
                             sent = True
                 if not sent:
                     sent = self.send_direct(path[-1], (CONNECTION_REQUEST, (source_index, target_index,
                                                                             path[:-1], [*visited, self.index])))
-                    if sent:
-                        self.print_info(
-                            f'Agent {self.index} transferring connection_request with target Agent {target_index}'
-                            f' to Agent {path[-1]} - path={path}, visited={visited}, neighbors={[n.index for n in self.neighbors]}')
+                    if sent and self.trace_level >= DEBUG:
+                        self.tracer.emit(tracing.CONNECTION_REQUEST_FORWARDED, agent=self.index, target=target_index,
+                                         hop=path[-1], path=path, visited=visited)
                 if not sent:
                     print(f'ERROR: Connection Request failed unexpectedly - path={path}, visited={visited}')
                     print(self.index)
@@ -161,112 +305,201 @@ class Agent:
             elif message_type == CONNECTION_SUCCESSFUL:
                 path = message_content
                 index = path[-1]
-                self.indirect_neighbors.append((index, path))
-                self.print_info(f'Connection between Agent {self.index} and Agent {index} successful')
+                if index not in self.indirect_neighbors:
+                    self.count('indirect_links')
+                self.add_indirect_neighbor(index, tuple(path))
+                if self.trace_level >= INFO:
+                    self.tracer.emit(tracing.CONNECTION_ESTABLISHED, agent=self.index, target=index)
             elif message_type == NO_SOLUTION:
                 self.no_sol = True
                 for agent in self.neighbors:
                     if not agent.no_sol:
-                        self.new_messages.append({'source': self, 'agent': agent, 'message': (NO_SOLUTION, None)})
+                        self.new_messages.append(Envelope(self, agent, (NO_SOLUTION, None)))
                 break
             else:
                 print('ERROR: Invalid message type')
                 exit()
-        self.messages = []
-        return self.new_messages
+        self.messages.clear()
+        if self.coalesce_ok:
+            self.new_messages, suppressed = coalesce_ok_messages(self.new_messages)
+            self.count('ok_suppressed', suppressed)
+        return self.take_messages()
 
     def check_agent_view(self):
         if not self.is_consistent(self.number):
-            self.print_info(
-                f'Agent {self.index} with number {self.number} is inconsistent with agent_view {self.agent_view}')
-            new_value = None
-            for number in self.options:
-                if self.is_consistent(number):
-                    new_value = number
-                    break
+            if self.trace_level >= DEBUG:
+                self.tracer.emit(tracing.INCONSISTENT, agent=self.index, number=self.number, agent_view=self.agent_view)
+            new_value = self.first_consistent_value()
             if new_value is None:
-                self.print_info(f'Agent {self.index} has no value consistent with agent_view {self.agent_view}'
-                                f' - Backtracking')
+                if self.trace_level >= INFO:
+                    self.tracer.emit(tracing.BACKTRACK, agent=self.index, agent_view=self.agent_view)
                 self.backtrack()
             else:
-                self.print_info(f'Agent {self.index} assigned new value {new_value}')
+                if self.trace_level >= INFO:
+                    self.tracer.emit(tracing.VALUE_CHANGED, agent=self.index, number=new_value)
                 self.number = new_value
-                for neighbor in self.neighbors:
-                    if neighbor.index > self.index:
-                        self.new_messages.append({'source': self, 'agent': neighbor,
-                                                  'message': (OK, (self.index, self.number))})
-                for index, path in self.indirect_neighbors:
-                    if index > self.index:
-                        self.send_indirect_path(path, (OK, (self.index, self.number)))
-        else:
-            self.print_info(
-                f'Agent {self.index} with number {self.number} is consistent with agent_view {self.agent_view}')
+                self.send_value()
+        elif self.trace_level >= DEBUG:
+            self.tracer.emit(tracing.CONSISTENT, agent=self.index, number=self.number, agent_view=self.agent_view)
+
+    def send_value(self):
+        # Sends the current value to every lower priority agent this one is linked to
+        for neighbor in self.neighbors:
+            if neighbor.rank > self.rank:
+                self.new_messages.append(Envelope(self, neighbor, (OK, (self.index, self.number))))
+        for index, paths in self.indirect_neighbors.items():
+            if self.rank_of(index) > self.rank and index not in self.neighbor_map:
+                for path in paths:
+                    self.send_indirect_path(path, (OK, (self.index, self.number)))
 
     def backtrack(self):
-        # More efficient versions of ABT try to find a minimal no_good here
-        no_good = copy(self.agent_view)
+        if self.minimize_no_goods:
+            no_good = self.minimal_no_good()
+        else:
+            no_good = list(self.agent_view.items())
+        self.count('no_goods_sent')
+        self.count('no_good_size', len(no_good))
+        self.count('no_good_size_pruned', len(self.agent_view) - len(no_good))
 
         if len(no_good) == 0:
+            if self.trace_level >= INFO:
+                self.tracer.emit(tracing.NO_SOLUTION_FOUND, agent=self.index)
             for agent in self.neighbors:
-                self.new_messages.append({'source': self, 'agent': agent,
-                                          'message': (NO_SOLUTION, None)})
+                self.new_messages.append(Envelope(self, agent, (NO_SOLUTION, None)))
             return
 
-        max_index, _ = max(no_good, key=lambda p: p[0])
-        self.print_info(f'Agent {self.index} sending no_good {no_good} to Agent {max_index}')
+        # The nogood goes to its lowest priority agent
+        max_index, _ = max(no_good, key=lambda p: self.rank_of(p[0]))
+        if self.trace_level >= INFO:
+            self.tracer.emit(tracing.NO_GOOD_SENT, agent=self.index, target=max_index, no_good=no_good)
         sent = self.send_direct(max_index, (NO_GOOD, (self.index, no_good)))
         if not sent:
             sent = self.send_indirect(max_index, (NO_GOOD, (self.index, no_good)))
         if not sent:
             print('ERROR: No_good contains non-neighbor')
-        for index, number in self.agent_view:
-            if index == max_index:
-                self.agent_view.remove((index, number))
-                break
+        self.remove_view(max_index)
         self.check_agent_view()
 
+    def add_indirect_neighbor(self, index, path):
+        # Every path set up to an agent is kept, since OK messages go out on all of them. The first one carries
+        # everything else, so messages to an agent keep arriving in the order they were sent
+        if self.indirect_neighbors is NO_INDIRECT_NEIGHBORS:
+            self.indirect_neighbors = {}
+        self.indirect_neighbors.setdefault(index, []).append(path)
+
+    def connection_hop(self, target_index):
+        # Without a routing table connection requests start a depth-first search from the first neighbor
+        if self.router is None:
+            return self.neighbors[0]
+        agent = self.neighbor_map.get(self.router.next_hop(self.index, target_index))
+        if agent is None:
+            print(f'ERROR: Connection Request Failed, No Path between Agent {self.index} and Agent {target_index}')
+            exit()
+        return agent
+
+    def minimal_no_good(self):
+        # Every value is ruled out either by a neighbor holding it or by an active stored nogood. Pick one such reason
+        # per value, preferring ones already covered by the pairs chosen so far, then the fewest new pairs and finally
+        # the highest priority agents, and send only the union of the chosen reasons
+        holders = {}
+        for index in self.neighbor_indices:
+            number = self.agent_view.get(index)
+            if number is not None:
+                holders.setdefault(number, []).append([(index, number)])
+        candidates = []
+        for number in self.options:
+            reasons = holders.get(number, [])
+            reasons.extend(self.no_goods.reasons(number))
+            candidates.append(reasons)
+        candidates.sort(key=len)
+        chosen = set()
+        for reasons in candidates:
+            if not reasons or any(chosen.issuperset(reason) for reason in reasons):
+                continue
+            best = min(reasons, key=lambda reason: (len(set(reason) - chosen),
+                                                     max(self.rank_of(index) for index, _ in reason)))
+            chosen.update(best)
+        return sorted(chosen)
+
+    def set_view(self, index, number):
+        old_number = self.agent_view.get(index)
+        if old_number == number:
+            return
+        self.agent_view[index] = number
+        if index in self.neighbor_indices:
+            if old_number is not None:
+                self.forbid(old_number, -1)
+            self.forbid(number, 1)
+        self.no_goods.update(index, old_number, number)
+
+    def remove_view(self, index):
+        old_number = self.agent_view.pop(index, None)
+        if old_number is not None:
+            if index in self.neighbor_indices:
+                self.forbid(old_number, -1)
+            self.no_goods.update(index, old_number, None)
+
+    def forbid(self, number, change):
+        bit = self.option_bits.get(number)
+        if bit is None:
+            return
+        position = bit.bit_length() - 1
+        self.forbidden_counts[position] += change
+        if self.forbidden_counts[position]:
+            self.forbidden_mask |= bit
+        else:
+            self.forbidden_mask &= ~bit
+
     def send_direct(self, index, message):
-        for agent in self.neighbors:
-            if agent.index == index:
-                self.new_messages.append({'source': self, 'agent': agent, 'message': message})
-                return True
-        return False
+        agent = self.neighbor_map.get(index)
+        if agent is None:
+            return False
+        self.new_messages.append(Envelope(self, agent, message))
+        return True
 
     def send_indirect(self, index, message):
-        for idx, path in self.indirect_neighbors:
-            if idx == index:
-                self.send_indirect_path(path, message)
-                return True
-        return False
+        paths = self.indirect_neighbors.get(index)
+        if not paths:
+            return False
+        self.send_indirect_path(paths[0], message)
+        return True
 
     def send_indirect_path(self, path, message):
-        for agent in self.neighbors:
-            if agent.index == path[0]:
-                if len(path) == 1:
-                    self.new_messages.append({'source': self, 'agent': agent, 'message': message})
-                else:
-                    self.new_messages.append(
-                        {'source': self, 'agent': agent, 'message': (INDIRECT, (path[1:], message))})
-                return
+        agent = self.neighbor_map.get(path[0])
+        if agent is not None:
+            if len(path) == 1:
+                self.new_messages.append(Envelope(self, agent, message))
+            else:
+                self.new_messages.append(Envelope(self, agent, (INDIRECT, Route(path, 1, message))))
+            return
         print(f'ERROR: Indirect Message Failed. Path = {path}, Message = {message}')
         exit()
 
+    def forward(self, message):
+        # Relayed messages share one route object that is advanced in place, so each hop only creates an Envelope
+        route = message[1]
+        agent = self.neighbor_map.get(route.path[route.hop])
+        if agent is None:
+            print(f'ERROR: Indirect Message Failed. Path = {route.path[route.hop:]}, Message = {route.message}')
+            exit()
+        if route.hop == len(route.path) - 1:
+            self.new_messages.append(Envelope(self, agent, route.message))
+        else:
+            route.hop += 1
+            self.new_messages.append(Envelope(self, agent, message))
+
     def is_consistent(self, number):
-        for index, agent_number in self.agent_view:
-            is_neighbor = False
-            for agent in self.neighbors:
-                if agent.index == index:
-                    is_neighbor = True
-                    break
-            if not is_neighbor:
-                continue
-            if agent_number == number:
-                return False
-        for no_good in self.no_goods:
-            if set(no_good).issubset({*self.agent_view, (self.index, number)}):
-                return False
-        return True
+        self.constraint_checks += 1
+        bit = self.option_bits.get(number)
+        if bit is None or self.forbidden_mask & bit:
+            return False
+        return not self.no_goods.is_blocked(number)
 
-    def print_info(self, string):
-        if self.verbose:
-            print(string)
+    def first_consistent_value(self):
+        self.constraint_checks += 1
+        if self.no_goods.blocks_all:
+            return None
+        free = self.full_mask & ~(self.forbidden_mask | self.no_goods.blocked_mask)
+        if not free:
+            return None
+        return self.options[(free & -free).bit_length() - 1]
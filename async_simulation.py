@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter, deque
+
+from examples import get_example
+from ordering import INDEX, ORDERINGS
+from simulation import build_agents
+from termination import TerminationDetector
+
+
+def no_delay():
+    return lambda envelope: 0
+
+
+def constant_delay(seconds):
+    return lambda envelope: seconds
+
+
+def uniform_delay(low, high, seed=None):
+    rng = random.Random(seed)
+    return lambda envelope: rng.uniform(low, high)
+
+
+class AsyncSimulation:
+    # Every agent runs as its own task with an asyncio.Queue mailbox and handles messages one at a time as they
+    # arrive. A message spends delay_model(envelope) seconds in transit; messages between the same pair of agents are
+    # still delivered in the order they were sent, as ABT assumes.
+    def __init__(self, agents, delay_model=None):
+        self.agents = agents
+        self.delay_model = delay_model if delay_model is not None else no_delay()
+        self.mailboxes = {}
+        self.channels = {}
+        self.channel_times = {}
+        self.message_counts = Counter()
+        self.activations = 0
+        self.detector = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.done = None
+        self.loop = None
+
+    def send(self, envelopes):
+        for envelope in envelopes:
+            self.message_counts[envelope.message[0]] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            channel = (envelope.source.index, envelope.agent.index)
+            deliver_at = max(self.loop.time() + self.delay_model(envelope), self.channel_times.get(channel, 0))
+            self.channel_times[channel] = deliver_at
+            self.channels.setdefault(channel, deque()).append(envelope)
+            self.loop.call_at(deliver_at, self.deliver, channel)
+
+    def deliver(self, channel):
+        # Timers due at the same time may fire in any order, so each one delivers the oldest message of its channel
+        envelope = self.channels[channel].popleft()
+        self.in_flight -= 1
+        self.mailboxes[envelope.agent.index].put_nowait(envelope.message)
+
+    def activate(self, agent):
+        self.activations += 1
+        self.detector.activating(agent)
+        envelopes = agent.process_messages()
+        self.detector.activated(agent, envelopes)
+        self.send(envelopes)
+        if self.detector.terminated():
+            self.done.set()
+
+    async def agent_loop(self, agent):
+        mailbox = self.mailboxes[agent.index]
+        self.activate(agent)
+        while True:
+            message = await mailbox.get()
+            agent.message(message)
+            self.activate(agent)
+
+    async def run(self, timeout=None):
+        self.loop = asyncio.get_running_loop()
+        self.done = asyncio.Event()
+        self.mailboxes = {agent.index: asyncio.Queue() for agent in self.agents}
+        self.detector = TerminationDetector(self.agents)
+        start = time.perf_counter()
+        loop_start = self.loop.time()
+        tasks = [asyncio.create_task(self.agent_loop(agent)) for agent in self.agents]
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        time_to_solution = self.loop.time() - loop_start
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        no_sol = any(agent.no_sol for agent in self.agents)
+        return {
+            'coloring': None if no_sol else [agent.number for agent in self.agents],
+            'no_solution': no_sol,
+            'quiescent': self.detector.quiescent(),
+            'converged': self.detector.converged,
+            'time_to_convergence': self.detector.time_to_convergence,
+            'activations': self.activations,
+            'messages': sum(self.message_counts.values()),
+            'message_counts': dict(self.message_counts),
+            'max_in_flight': self.max_in_flight,
+            'time_to_solution': time_to_solution,
+            'wall_time': time.perf_counter() - start,
+        }
+
+
+def solve(graph, num_colors, delay_model=None, initial_assignments=None, seed=None, timeout=None,
+          **agent_options):
+    agents = build_agents(graph, num_colors, initial_assignments=initial_assignments, seed=seed,
+                          **agent_options)
+    return asyncio.run(AsyncSimulation(agents, delay_model=delay_model).run(timeout=timeout))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run ABT graph coloring with one asyncio task per agent')
+    parser.add_argument('--example', type=int, default=2)
+    parser.add_argument('--colors', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--min-delay', type=float, default=0.0)
+    parser.add_argument('--max-delay', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=None)
+    parser.add_argument('--ordering', choices=ORDERINGS, default=INDEX, help='priority ordering of the agents')
+    args = parser.parse_args()
+
+    graph, _, initial_assignments, _ = get_example(args.example)
+    result = solve(graph, args.colors, delay_model=uniform_delay(args.min_delay, args.max_delay, seed=args.seed),
+                   initial_assignments=initial_assignments, seed=args.seed, timeout=args.timeout,
+                   ordering=args.ordering)
+    for key, value in result.items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
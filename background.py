@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class Snapshot:
+    # The state of a run after a cycle: every agent's value (None before it picked one), which agents know there is no
+    # solution, and the messages sent in that cycle as (source, target, type), capped at max_messages
+    __slots__ = ('cycle', 'numbers', 'no_sol', 'messages', 'done')
+
+    def __init__(self, cycle, numbers, no_sol, messages, done):
+        self.cycle = cycle
+        self.numbers = numbers
+        self.no_sol = no_sol
+        self.messages = messages
+        self.done = done
+
+
+class SolverThread(threading.Thread):
+    # Runs a Simulation in the background and publishes a new Snapshot at most every publish_interval seconds, and
+    # always after the last cycle. Readers just take the latest one from snapshot, which is replaced as a whole and
+    # never modified. cycles_per_second paces the run, None runs it at full speed
+    def __init__(self, simulation, cycles_per_second=None, publish_interval=1 / 60, max_messages=500):
+        super().__init__(daemon=True)
+        self.simulation = simulation
+        self.cycles_per_second = cycles_per_second
+        self.publish_interval = publish_interval
+        self.max_messages = max_messages
+        self.stopped = threading.Event()
+        self.snapshot = self.take_snapshot(False)
+
+    def take_snapshot(self, done):
+        agents = self.simulation.agents
+        messages = [(msg.source.index, msg.agent.index, msg.message_type)
+                    for msg in self.simulation.sent[:self.max_messages]]
+        return Snapshot(self.simulation.cycle, [agent.number for agent in agents],
+                        [agent.no_sol for agent in agents], messages, done)
+
+    def run(self):
+        start = time.perf_counter()
+        published = start
+        while not self.stopped.is_set() and not self.simulation.detector.terminated():
+            if not self.simulation.step():
+                break
+            now = time.perf_counter()
+            if self.cycles_per_second is not None:
+                self.stopped.wait(start + self.simulation.cycle / self.cycles_per_second - now)
+                now = time.perf_counter()
+            if self.cycles_per_second is not None or now - published >= self.publish_interval:
+                self.snapshot = self.take_snapshot(False)
+                published = now
+        self.snapshot = self.take_snapshot(True)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
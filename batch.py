@@ -0,0 +1,240 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from multiprocessing.connection import wait
+
+from graph import Graph, load_graph
+from ordering import INDEX, ORDERINGS
+from reduction import solve as solve_reduced
+from routing import DFS, SHORTEST_PATH
+from scheduling import SCHEDULERS, SYNCHRONOUS
+from simulation import solve
+
+# resource only exists on Unix, elsewhere memory limits are not available
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SOLVED = 'solved'
+NO_SOLUTION = 'no_solution'
+UNSOLVED = 'unsolved'
+TIMEOUT = 'timeout'
+MEMORY = 'memory'
+ERROR = 'error'
+
+
+def read_instances(path):
+    # A directory yields every .col file in it, anything else is read as JSON lines with one instance per line, e.g.
+    # {"id": "a", "nodes": 4, "edges": [[0, 1], [1, 2]], "colors": 3}. Instead of nodes and edges an instance can give
+    # a graph file as "graph" or a graph matrix as "matrix", and colors and seed override the defaults. - reads stdin.
+    # A line that is not a JSON object yields an instance holding only its line number as id and the error
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.col'):
+                yield {'id': name, 'graph': os.path.join(path, name)}
+        return
+    file = sys.stdin if path == '-' else open(path)
+    for number, line in enumerate(file):
+        if line.strip():
+            try:
+                instance = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield {'id': number, 'error': f'line {number + 1}: {error.msg} at column {error.colno}'}
+                continue
+            if not isinstance(instance, dict):
+                yield {'id': number, 'error': f'line {number + 1}: not a JSON object'}
+                continue
+            instance.setdefault('id', number)
+            yield instance
+    if file is not sys.stdin:
+        file.close()
+
+
+def instance_graph(instance):
+    if 'graph' in instance:
+        return load_graph(instance['graph'])
+    if 'edges' in instance:
+        edges = [tuple(edge) for edge in instance['edges']]
+        num_nodes = instance.get('nodes', max((max(edge) for edge in edges), default=-1) + 1)
+        return Graph.from_edges(num_nodes, edges)
+    if 'matrix' in instance:
+        return Graph.from_matrix(instance['matrix'])
+    raise ValueError(f'Instance {instance["id"]} has no graph, edges or matrix')
+
+
+def failed(instance, status, wall_time=None, error=None):
+    return {'id': instance['id'], 'status': status, 'coloring': None, 'wall_time': wall_time, 'error': error}
+
+
+def solve_instance(instance, num_colors, seed=None, max_cycles=None, reduce=False, **options):
+    graph = instance_graph(instance)
+    num_colors = instance.get('colors', num_colors)
+    solver = solve_reduced if reduce else solve
+    result = solver(graph, num_colors, seed=instance.get('seed', seed), max_cycles=max_cycles, **options)
+    if result['no_solution']:
+        status = NO_SOLUTION
+    elif result['converged']:
+        status = SOLVED
+    else:
+        status = UNSOLVED
+    return {
+        'id': instance['id'],
+        'status': status,
+        'nodes': len(graph),
+        'edges': graph.num_edges,
+        'colors': num_colors,
+        'coloring': result['coloring'] if status == SOLVED else None,
+        'cycles': result['cycles'],
+        'messages': result['messages'],
+        'message_counts': result['message_counts'],
+        'wall_time': result['wall_time'],
+    }
+
+
+def worker(connection, memory_limit, options):
+    # Solves the instances sent over connection one at a time until it receives None. Agents report broken runs by
+    # printing and exiting, so that output goes to stderr and the exit is caught like any other error
+    sys.stdout = sys.stderr
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    while True:
+        instance = connection.recv()
+        if instance is None:
+            return
+        start = time.perf_counter()
+        try:
+            row = solve_instance(instance, **options)
+        except MemoryError:
+            row = failed(instance, MEMORY, time.perf_counter() - start)
+        except SystemExit:
+            row = failed(instance, ERROR, time.perf_counter() - start, 'the agents stopped the run')
+        except Exception as error:
+            row = failed(instance, ERROR, time.perf_counter() - start, repr(error))
+        connection.send(row)
+
+
+class Worker:
+    def __init__(self, memory_limit, options):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker, args=(child_connection, memory_limit, options),
+                                               daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.instance = None
+        self.started = None
+
+    def assign(self, instance):
+        self.instance = instance
+        self.started = time.perf_counter()
+        self.connection.send(instance)
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+def solve_batch(instances, num_colors, processes=None, timeout=None, memory_limit=None, **options):
+    # Spreads the instances over a pool of worker processes and yields one row per instance as soon as it finishes,
+    # so rows come out of order. A worker that runs past timeout seconds on an instance or dies is replaced by a new
+    # one. memory_limit caps the address space of every worker in bytes; running out only fails the instance.
+    if memory_limit is not None and resource is None:
+        raise ValueError('Memory limits need the resource module, which this platform does not have')
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    options = dict(options, num_colors=num_colors)
+    instances = iter(instances)
+    workers = [Worker(memory_limit, options) for _ in range(processes)]
+    remaining = True
+    try:
+        while True:
+            for current in workers:
+                while current.instance is None and remaining:
+                    instance = next(instances, None)
+                    if instance is None:
+                        remaining = False
+                    elif 'error' in instance:
+                        # Instances that could not be read fail right away without taking up a worker
+                        yield failed(instance, ERROR, error=instance['error'])
+                    else:
+                        current.assign(instance)
+            busy = [current for current in workers if current.instance is not None]
+            if not busy:
+                return
+            wait_time = None
+            if timeout is not None:
+                wait_time = max(0.0, min(current.started for current in busy) + timeout - time.perf_counter())
+            ready = wait([current.connection for current in busy], wait_time)
+            for i, current in enumerate(workers):
+                if current.instance is None:
+                    continue
+                elapsed = time.perf_counter() - current.started
+                if current.connection in ready:
+                    try:
+                        row = current.connection.recv()
+                    except EOFError:
+                        # The process died, e.g. killed by the operating system for using too much memory
+                        row = failed(current.instance, ERROR, elapsed, f'exit code {current.process.exitcode}')
+                        current.kill()
+                        workers[i] = current = Worker(memory_limit, options)
+                    current.instance = None
+                    yield row
+                elif timeout is not None and elapsed >= timeout:
+                    instance = current.instance
+                    current.kill()
+                    workers[i] = Worker(memory_limit, options)
+                    yield failed(instance, TIMEOUT, elapsed)
+    finally:
+        for current in workers:
+            if current.instance is None and current.process.is_alive():
+                current.connection.send(None)
+                current.process.join()
+            else:
+                current.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Color many graphs across a pool of processes, writing one JSON line '
+                                                 'per graph as it finishes')
+    parser.add_argument('instances', help='JSON lines file with one instance per line, - for stdin, or a directory '
+                                          'of .col files')
+    parser.add_argument('--colors', type=int, default=3, help='colors for instances that do not set their own')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None, help='seconds allowed per instance')
+    parser.add_argument('--memory-limit', type=int, default=None, help='megabytes of address space per worker')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-cycles', type=int, default=None)
+    parser.add_argument('--routing', choices=[DFS, SHORTEST_PATH], default=DFS)
+    parser.add_argument('--scheduler', choices=SCHEDULERS, default=SYNCHRONOUS)
+    parser.add_argument('--ordering', choices=ORDERINGS, default=INDEX, help='priority ordering of the agents')
+    parser.add_argument('--reduce', action='store_true',
+                        help='solve only the k-core, one ABT run per component, and color the rest back in')
+    parser.add_argument('--output', default=None, help='file to write the JSON lines to instead of stdout')
+    args = parser.parse_args()
+
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit is not None else None
+    output = open(args.output, 'w') if args.output is not None else sys.stdout
+    statuses = Counter()
+    start = time.perf_counter()
+    for row in solve_batch(read_instances(args.instances), args.colors, processes=args.processes,
+                           timeout=args.timeout, memory_limit=memory_limit, seed=args.seed,
+                           max_cycles=args.max_cycles, routing=args.routing, scheduler=args.scheduler,
+                           ordering=args.ordering, reduce=args.reduce):
+        statuses[row['status']] += 1
+        output.write(json.dumps(row) + '\n')
+        output.flush()
+    if args.output is not None:
+        output.close()
+    elapsed = time.perf_counter() - start
+    total = sum(statuses.values())
+    print(f'{total} instances in {elapsed:.2f} seconds ({total / elapsed if elapsed else 0:.1f} per second): '
+          + ', '.join(f'{count} {status}' for status, count in sorted(statuses.items())), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
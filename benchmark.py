@@ -0,0 +1,253 @@
+import argparse
+import gc
+import json
+import math
+import random
+import sys
+import tracemalloc
+
+from examples import get_example
+from graph import Graph, load_graph
+from nogood_store import OLDEST, LARGEST
+from ordering import INDEX, ORDERINGS
+from reduction import solve as solve_reduced
+from routing import DFS, SHORTEST_PATH
+from scheduling import SCHEDULERS, SYNCHRONOUS, make_scheduler
+from simulation import Simulation, build_agents, solve
+
+COMPARED_METRICS = ['messages', 'cycles', 'nccc', 'peak_no_goods']
+MEMORY_METRICS = ['bytes_per_agent_built', 'bytes_per_agent_solved']
+
+
+def gnp_graph(num_nodes, p, seed=None):
+    # Batagelj and Brandes' geometric skipping, so sparse graphs cost time proportional to their edges
+    rng = random.Random(seed)
+    edges = []
+    if p > 0:
+        log_q = math.log(1 - p) if p < 1 else None
+        v, w = 1, -1
+        while v < num_nodes:
+            if log_q is None:
+                w += 1
+            else:
+                w += 1 + int(math.log(1 - rng.random()) / log_q)
+            while w >= v and v < num_nodes:
+                w -= v
+                v += 1
+            if v < num_nodes:
+                edges.append((v, w))
+    return Graph.from_edges(num_nodes, edges)
+
+
+def grid_graph(rows, cols):
+    edges = []
+    for row in range(rows):
+        for col in range(cols):
+            index = row * cols + col
+            if col + 1 < cols:
+                edges.append((index, index + 1))
+            if row + 1 < rows:
+                edges.append((index, index + cols))
+    return Graph.from_edges(rows * cols, edges)
+
+
+def planar_graph(rows, cols, seed=None):
+    # A grid with one randomly chosen diagonal in every cell, which keeps it planar
+    rng = random.Random(seed)
+    edges = list(grid_graph(rows, cols).edges())
+    for row in range(rows - 1):
+        for col in range(cols - 1):
+            index = row * cols + col
+            if rng.random() < 0.5:
+                edges.append((index, index + cols + 1))
+            else:
+                edges.append((index + 1, index + cols))
+    return Graph.from_edges(rows * cols, edges)
+
+
+def make_instance(spec, seed):
+    # gnp:<nodes>:<p>, grid:<rows>:<cols>, planar:<rows>:<cols>, example:<number> or a graph file
+    kind, _, arguments = spec.partition(':')
+    arguments = arguments.split(':') if arguments else []
+    if kind == 'gnp':
+        return gnp_graph(int(arguments[0]), float(arguments[1]), seed=seed)
+    if kind == 'grid':
+        return grid_graph(int(arguments[0]), int(arguments[1]))
+    if kind == 'planar':
+        return planar_graph(int(arguments[0]), int(arguments[1]), seed=seed)
+    if kind == 'example':
+        return get_example(int(arguments[0]))[0]
+    return load_graph(spec)
+
+
+def run(spec, graph, num_colors, seed, max_cycles=None, reduce=False, **options):
+    # With reduce only the num_colors-core of the graph goes through ABT, see reduction.py
+    solver = solve_reduced if reduce else solve
+    result = solver(graph, num_colors, seed=seed, max_cycles=max_cycles, **options)
+    return {
+        'instance': spec,
+        'nodes': len(graph),
+        'edges': graph.num_edges,
+        'colors': num_colors,
+        'seed': seed,
+        'config': dict(options, reduce=reduce),
+        'solved': result['converged'],
+        'no_solution': result['no_solution'],
+        'quiescent': result['quiescent'],
+        'cycles': result['cycles'],
+        'nccc': result['nccc'],
+        'constraint_checks': result['constraint_checks'],
+        'messages': result['messages'],
+        'message_counts': result['message_counts'],
+        'peak_no_goods': result['no_good_store']['peak_size'],
+        'wall_time': result['wall_time'],
+        'time_to_convergence': result['time_to_convergence'],
+    }
+
+
+def measure_memory(spec, graph, num_colors, seed, max_cycles=None, scheduler=SYNCHRONOUS, **options):
+    # Memory allocated per agent according to tracemalloc, not counting the graph: once the agents are built, once the
+    # run finished and everything it no longer holds was freed, and at the peak in between
+    gc.collect()
+    tracemalloc.start()
+    try:
+        agents = build_agents(graph, num_colors, seed=seed, **options)
+        built = tracemalloc.get_traced_memory()[0]
+        result = Simulation(agents, scheduler=make_scheduler(scheduler, agents, seed=seed)).run(max_cycles=max_cycles)
+        gc.collect()
+        solved, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'instance': spec,
+        'nodes': len(graph),
+        'edges': graph.num_edges,
+        'colors': num_colors,
+        'seed': seed,
+        'config': dict(options, scheduler=scheduler),
+        'solved': result['converged'],
+        'bytes_per_agent_built': built / len(graph),
+        'bytes_per_agent_solved': solved / len(graph),
+        'peak_bytes_per_agent': peak / len(graph),
+    }
+
+
+def row_key(row):
+    return row['instance'], row['colors'], row['seed'], json.dumps(row['config'], sort_keys=True)
+
+
+def compare(rows, baseline_rows, tolerance=0.0, time_tolerance=None):
+    # Lists every metric that got worse than in the baseline by more than the tolerance, as a fraction
+    baseline = {row_key(row): row for row in baseline_rows}
+    regressions = []
+    for row in rows:
+        old = baseline.get(row_key(row))
+        if old is None:
+            continue
+        metrics = COMPARED_METRICS + MEMORY_METRICS + (['wall_time'] if time_tolerance is not None else [])
+        for metric in metrics:
+            if metric not in row or metric not in old:
+                continue
+            allowed = time_tolerance if metric == 'wall_time' else tolerance
+            if row[metric] > old[metric] * (1 + allowed):
+                regressions.append((row_key(row), metric, old[metric], row[metric]))
+    return regressions
+
+
+def ordering_savings(rows, baseline_ordering):
+    # Totals the messages and cycles each ordering saves over baseline_ordering on the runs both of them did, i.e. the
+    # same instance, seed, color count and otherwise the same options
+    def without_ordering(row):
+        config = {key: value for key, value in row['config'].items() if key != 'ordering'}
+        return row['instance'], row['colors'], row['seed'], json.dumps(config, sort_keys=True)
+
+    baseline = {without_ordering(row): row for row in rows if row['config'].get('ordering') == baseline_ordering}
+    savings = {}
+    for row in rows:
+        ordering = row['config'].get('ordering')
+        old = baseline.get(without_ordering(row))
+        if ordering == baseline_ordering or old is None:
+            continue
+        totals = savings.setdefault(ordering, {'runs': 0, 'messages': 0, 'cycles': 0,
+                                               'baseline_messages': 0, 'baseline_cycles': 0})
+        totals['runs'] += 1
+        totals['messages'] += old['messages'] - row['messages']
+        totals['cycles'] += old['cycles'] - row['cycles']
+        totals['baseline_messages'] += old['messages']
+        totals['baseline_cycles'] += old['cycles']
+    return savings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ABT graph coloring and write one JSON line per run')
+    parser.add_argument('instances', nargs='+',
+                        help='gnp:<nodes>:<p>, grid:<rows>:<cols>, planar:<rows>:<cols>, example:<n> or a graph file')
+    parser.add_argument('--colors', type=int, nargs='+', default=[3])
+    parser.add_argument('--seeds', type=int, default=1, help='number of seeds to run per instance and color count')
+    parser.add_argument('--max-cycles', type=int, default=None)
+    parser.add_argument('--routing', choices=[DFS, SHORTEST_PATH], default=DFS)
+    parser.add_argument('--scheduler', choices=SCHEDULERS, default=SYNCHRONOUS)
+    parser.add_argument('--orderings', choices=ORDERINGS, nargs='+', default=[INDEX],
+                        help='priority orderings to run, the savings of each over the first one are printed')
+    parser.add_argument('--reduce', action='store_true',
+                        help='solve only the k-core, one ABT run per component, and color the rest back in')
+    parser.add_argument('--minimize-no-goods', action='store_true')
+    parser.add_argument('--forget-no-goods', action='store_true')
+    parser.add_argument('--max-no-goods', type=int, default=None,
+                        help='cap on the nogoods each agent stores; active ones are never evicted, so a store can '
+                             'stay above it while all of its nogoods are active')
+    parser.add_argument('--no-good-eviction', choices=[OLDEST, LARGEST], default=OLDEST)
+    parser.add_argument('--coalesce-ok', action='store_true')
+    parser.add_argument('--memory', action='store_true',
+                        help='measure the memory per agent instead, which is slower and does not support --reduce')
+    parser.add_argument('--output', default=None, help='file to write the JSON lines to instead of stdout')
+    parser.add_argument('--compare', default=None, help='JSON lines of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.0)
+    parser.add_argument('--time-tolerance', type=float, default=None)
+    args = parser.parse_args()
+    if args.memory and args.reduce:
+        parser.error('--memory does not support --reduce')
+
+    options = {'routing': args.routing, 'scheduler': args.scheduler, 'reduce': args.reduce,
+               'minimize_no_goods': args.minimize_no_goods,
+               'forget_no_goods': args.forget_no_goods, 'max_no_goods': args.max_no_goods,
+               'no_good_eviction': args.no_good_eviction, 'coalesce_ok': args.coalesce_ok}
+    output = open(args.output, 'w') if args.output is not None else sys.stdout
+    rows = []
+    for spec in args.instances:
+        for seed in range(args.seeds):
+            graph = make_instance(spec, seed)
+            for num_colors in args.colors:
+                for ordering in args.orderings:
+                    if args.memory:
+                        memory_options = {key: value for key, value in options.items() if key != 'reduce'}
+                        row = measure_memory(spec, graph, num_colors, seed, max_cycles=args.max_cycles,
+                                             ordering=ordering, **memory_options)
+                    else:
+                        row = run(spec, graph, num_colors, seed, max_cycles=args.max_cycles, ordering=ordering,
+                                  **options)
+                    rows.append(row)
+                    output.write(json.dumps(row) + '\n')
+                    output.flush()
+    if args.output is not None:
+        output.close()
+
+    savings = ordering_savings(rows, args.orderings[0]) if not args.memory else {}
+    for ordering, totals in savings.items():
+        messages = totals['messages'] / totals['baseline_messages'] if totals['baseline_messages'] else 0.0
+        cycles = totals['cycles'] / totals['baseline_cycles'] if totals['baseline_cycles'] else 0.0
+        print(f'{ordering} saves {totals["messages"]} messages ({messages:.1%}) and {totals["cycles"]} cycles '
+              f'({cycles:.1%}) over {args.orderings[0]} on {totals["runs"]} runs', file=sys.stderr)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline_rows = [json.loads(line) for line in file if line.strip()]
+        regressions = compare(rows, baseline_rows, tolerance=args.tolerance, time_tolerance=args.time_tolerance)
+        for key, metric, old, new in regressions:
+            print(f'REGRESSION: {key} {metric} {old} -> {new}', file=sys.stderr)
+        if regressions:
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
 import pygame
 import pygame.gfxdraw
+import heapq
 import math
+from array import array
 from math import cos, sin
 from dataclasses import dataclass
 
+from graph import as_graph
+
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (147, 112, 219), (160, 82, 45), (255, 105, 180)]
@@ -13,6 +17,7 @@ MESSAGE_COLORS = {'ok': (50, 205, 50),
                   'connection_successful': (25, 25, 112),
                   'no_solution': (0, 0, 0)}
 GRAPH_MESSAGE_ANIMATION = 'graph_message_animation'
+FINISHED = 1 << 62
 
 
 class GraphMessageAnimation:
@@ -29,16 +34,114 @@ class GraphMessageAnimation:
         self.callback_params = callback_params
 
 
-animations = []
+class AnimationStore:
+    # The message animations of one identifier. Messages wait in a heap ordered by the frame they start moving on, so
+    # advancing every animation is a single increment of the shared frame counter. Once a message starts it gets a slot
+    # in parallel arrays, and where it starts, its step per frame, how many frames it travels and the shape of its line
+    # are worked out once per layout instead of every frame. Finished slots are marked by moving their start out of
+    # reach and are only dropped once they make up half of the store, so removing a message costs O(1) amortized
+    def __init__(self):
+        self.waiting = []
+        self.added = 0
+        self.sources = array('q')
+        self.targets = array('q')
+        self.starts = array('q')
+        self.speeds = array('d')
+        self.message_types = []
+        self.callbacks = []
+        self.callback_params = []
+        self.layout_key = None
+        self.durations = array('q')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.dxs = array('d')
+        self.dys = array('d')
+        self.shapes = []
+        self.finished = 0
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, animation):
+        heapq.heappush(self.waiting, (frame - animation.time, self.added, animation))
+        self.added += 1
+
+    def start(self):
+        # Messages that start on the same frame keep the order they were added in
+        while self.waiting and self.waiting[0][0] <= frame:
+            start, _, animation = heapq.heappop(self.waiting)
+            self.sources.append(animation.source_index)
+            self.targets.append(animation.target_index)
+            self.starts.append(start)
+            self.speeds.append(animation.speed)
+            self.message_types.append(animation.message_type)
+            self.callbacks.append(animation.callback)
+            self.callback_params.append(animation.callback_params)
+
+    def prepare(self, positions, layout_key, width):
+        # shapes holds the corners of a message's line relative to its position, which only depend on its direction
+        if layout_key != self.layout_key:
+            self.layout_key = layout_key
+            for column in (self.durations, self.xs, self.ys, self.dxs, self.dys, self.shapes):
+                del column[:]
+        for k in range(len(self.durations), len(self.sources)):
+            i = self.sources[k]
+            j = self.targets[k]
+            vector = (positions[j][0] - positions[i][0], positions[j][1] - positions[i][1])
+            magnitude = math.sqrt(vector[0] ** 2 + vector[1] ** 2)
+            dx = self.speeds[k] * vector[0] / magnitude
+            dy = self.speeds[k] * vector[1] / magnitude
+            if dx:
+                self.durations.append(math.floor(vector[0] / dx))
+            else:
+                self.durations.append(math.floor(vector[1] / dy))
+            self.xs.append(positions[i][0])
+            self.ys.append(positions[i][1])
+            self.dxs.append(dx)
+            self.dys.append(dy)
+            corners = line_corners((0, 0), (4 * vector[0] / magnitude, 4 * vector[1] / magnitude), width)
+            self.shapes.append(tuple(value for corner in corners for value in corner))
+
+    def finish(self, slots):
+        # Returns the callbacks of the finished slots, in the order their messages were added
+        callbacks = []
+        for k in slots:
+            self.starts[k] = FINISHED
+            callbacks.append((self.callbacks[k], self.callback_params[k]))
+            self.callback_params[k] = None
+        self.finished += len(slots)
+        if self.finished * 2 > len(self):
+            self.keep([k for k in range(len(self)) if self.starts[k] != FINISHED])
+            self.finished = 0
+        return callbacks
+
+    def keep(self, slots):
+        for name in ('sources', 'targets', 'starts', 'speeds', 'durations', 'xs', 'ys', 'dxs', 'dys'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[k] for k in slots]))
+        for name in ('message_types', 'callbacks', 'callback_params', 'shapes'):
+            column = getattr(self, name)
+            setattr(self, name, [column[k] for k in slots])
+
+
+animations = {}
+frame = 0
 
 
 def step():
-    for animation in animations:
-        animation.time += 1
+    global frame
+    frame += 1
 
 
 def add_animation(animation):
-    animations.append(animation)
+    store = animations.get(animation.identifier)
+    if store is None:
+        store = animations[animation.identifier] = AnimationStore()
+    store.add(animation)
+
+
+def clear_animations(identifier):
+    animations.pop(identifier, None)
 
 
 def draw_arrow(screen, pos1, pos2, color=BLACK, width=10):
@@ -64,76 +167,125 @@ def draw_node(screen, center, radius=50, width=5, outline_color=BLACK, interior_
         interior_func(screen, center, radius, outline_color, args)
 
 
-def draw_graph(identifier, screen, graph_matrix, center, width, height, rel_positions=None,
+class GraphLayer:
+    # What draw_graph keeps between frames for one identifier: the layout, a surface with only the edges, one with the
+    # edges and every node as last drawn, and each node's last arguments. key holds everything the layout and edges
+    # depend on, and sources keeps the graph and positions in it alive so their ids can't be reused
+    def __init__(self, key, sources, positions, edges):
+        self.key = key
+        self.sources = sources
+        self.positions = positions
+        self.edges = edges
+        self.surface = edges.copy()
+        self.node_args = [None] * len(positions)
+
+
+layers = {}
+
+
+def get_layout(num_objects, center, width, height, rel_positions, node_radii):
+    width -= node_radii * 2
+    height -= node_radii * 2
+    if not rel_positions:
+        return get_polygon_points(num_objects, center, min(width, height) / 2 - node_radii)
+    rel_max = (max(pos[0] for pos in rel_positions), max(pos[1] for pos in rel_positions))
+    rel_min = (min(pos[0] for pos in rel_positions), min(pos[1] for pos in rel_positions))
+    rel_center = ((rel_max[0] + rel_min[0]) / 2, (rel_max[1] + rel_min[1]) / 2)
+    rel_width = rel_max[0] - rel_min[0]
+    rel_height = rel_max[1] - rel_min[1]
+    if (width / rel_width) * rel_height <= height:
+        scale = width / rel_width
+    else:
+        scale = height / rel_height
+    return [((pos[0] - rel_center[0]) * scale + center[0], (pos[1] - rel_center[1]) * scale + center[1])
+            for pos in rel_positions]
+
+
+def node_rect(position, args):
+    radius = round(args.get('radius', 50)) + 2
+    return pygame.Rect(round(position[0]) - radius, round(position[1]) - radius, 2 * radius + 1, 2 * radius + 1)
+
+
+def draw_graph(identifier, screen, graph, center, width, height, rel_positions=None,
                outline_color=BLACK, outline_thickness=5,
-               node_func=draw_node, node_func_args=None, node_fun_args_per_agent=None):
-    num_objects = len(graph_matrix)
+               node_func=draw_node, node_func_args=None, node_fun_args_per_agent=None, background=WHITE):
+    # The layout and a surface with the edges on background are built once per identifier, and again only when the
+    # graph, the positions passed in, the window or the drawing area change. Graphs and positions are compared by
+    # identity, so pass new objects rather than modifying them in place. Every frame only the nodes whose arguments
+    # changed are redrawn onto that surface, which is then copied to the screen with the messages in flight drawn over
+    # it, covering whatever was on the screen before
+    num_objects = len(graph)
     if node_func_args and 'radius' in node_func_args:
         node_radii = node_func_args['radius']
     else:
         node_radii = 50
-    width -= node_radii * 2
-    height -= node_radii * 2
-    if rel_positions:
-        rel_max = (max(pos[0] for pos in rel_positions), max(pos[1] for pos in rel_positions))
-        rel_min = (min(pos[0] for pos in rel_positions), min(pos[1] for pos in rel_positions))
-        rel_center = ((rel_max[0] + rel_min[0]) / 2, (rel_max[1] + rel_min[1]) / 2)
-        rel_width = rel_max[0] - rel_min[0]
-        rel_height = rel_max[1] - rel_min[1]
-        if (width / rel_width) * rel_height <= height:
-            scale = width / rel_width
-        else:
-            scale = height / rel_height
-        positions = rel_positions
-        for i in range(len(positions)):
-            pos = positions[i]
-            positions[i] = (
-                (pos[0] - rel_center[0]) * scale + center[0],
-                (pos[1] - rel_center[1]) * scale + center[1]
-            )
-    else:
-        positions = get_polygon_points(num_objects, center, min(width, height) / 2 - node_radii)
+    key = (id(graph), id(rel_positions), screen.get_size(), center, width, height, outline_color, outline_thickness,
+           node_radii, node_func, background)
+    layer = layers.get(identifier)
+    if layer is None or layer.key != key:
+        positions = get_layout(num_objects, center, width, height, rel_positions, node_radii)
+        edges = pygame.Surface(screen.get_size())
+        edges.fill(background)
+        for i, j in as_graph(graph).edges():
+            draw_line(edges, positions[i], positions[j], outline_color, outline_thickness)
+        layer = layers[identifier] = GraphLayer(key, (graph, rel_positions), positions, edges)
+    positions = layer.positions
     for i in range(num_objects):
-        for j in range(i + 1, num_objects):
-            if graph_matrix[i][j]:
-                draw_line(screen, positions[i], positions[j], outline_color, outline_thickness)
-    for animation in animations:
-        if animation.identifier == identifier and animation.animation_type == GRAPH_MESSAGE_ANIMATION and animation.time >= 0:
-            i = animation.source_index
-            j = animation.target_index
-            vector = (positions[j][0] - positions[i][0], positions[j][1] - positions[i][1])
-            magnitude = math.sqrt(vector[0] ** 2 + vector[1] ** 2)
-            dx = animation.speed * vector[0] / magnitude
-            dy = animation.speed * vector[1] / magnitude
-            if dx:
-                max_time = math.floor(vector[0] / dx)
-            else:
-                max_time = math.floor(vector[1] / dy)
-            if animation.time <= max_time:
-                final_position = (positions[i][0] + dx * animation.time, positions[i][1] + dy * animation.time)
-                draw_line(screen, final_position, (
-                    final_position[0] + 4 * vector[0] / magnitude, final_position[1] + 4 * vector[1] / magnitude),
-                          color=MESSAGE_COLORS[animation.message_type], width=outline_thickness * 2.5)
+        args = dict(node_func_args) if node_func_args else {}
+        if node_fun_args_per_agent:
+            args.update(node_fun_args_per_agent[i])
+        if args != layer.node_args[i]:
+            # Put back what was under the old node before drawing the new one, so antialiased outlines don't build up
+            if layer.node_args[i] is not None:
+                rect = node_rect(positions[i], layer.node_args[i])
+                layer.surface.blit(layer.edges, rect, rect)
+            layer.node_args[i] = args
+            node_func(layer.surface, positions[i], **args)
+    screen.blit(layer.surface, (0, 0))
+    # Nodes have to stay on top of the messages, so the nodes messages travel between are taken off the screen before
+    # the messages are drawn and drawn again after them
+    in_flight = []
+    covered = set()
+    store = animations.get(identifier)
+    if store is not None:
+        store.start()
+        store.prepare(positions, layer.key, outline_thickness * 2.5)
+        finished = []
+        sources, targets, starts, durations = store.sources, store.targets, store.starts, store.durations
+        xs, ys, dxs, dys, shapes = store.xs, store.ys, store.dxs, store.dys, store.shapes
+        for k in range(len(store)):
+            time = frame - starts[k]
+            if time < 0:
+                continue
+            if time <= durations[k]:
+                x = xs[k] + dxs[k] * time
+                y = ys[k] + dys[k] * time
+                shape = shapes[k]
+                in_flight.append((((x + shape[0], y + shape[1]), (x + shape[2], y + shape[3]),
+                                   (x + shape[4], y + shape[5]), (x + shape[6], y + shape[7])),
+                                  MESSAGE_COLORS[store.message_types[k]]))
+                covered.add(sources[k])
+                covered.add(targets[k])
             else:
-                if animation.callback:
-                    animation.callback(*animation.callback_params)
-                animations.remove(animation)
-    for i in range(num_objects):
-        if node_func_args:
-            if node_fun_args_per_agent:
-                node_func(screen, positions[i], **node_func_args, **(node_fun_args_per_agent[i]))
-            else:
-                node_func(screen, positions[i], **node_func_args)
-        else:
-            if node_fun_args_per_agent:
-                node_func(screen, positions[i], **(node_fun_args_per_agent[i]))
-            else:
-                node_func(screen, positions[i])
-
-
-def draw_csp_graph(identifier, screen, graph_matrix, node_colors, center, width, height, rel_positions=None,
+                finished.append(k)
+        # Finished messages are delivered together, in the order they were added
+        if finished:
+            for callback, callback_params in store.finish(finished):
+                if callback:
+                    callback(*callback_params)
+    for i in covered:
+        rect = node_rect(positions[i], layer.node_args[i])
+        screen.blit(layer.edges, rect, rect)
+    for corners, color in in_flight:
+        pygame.gfxdraw.aapolygon(screen, corners, color)
+        pygame.gfxdraw.filled_polygon(screen, corners, color)
+    for i in covered:
+        node_func(screen, positions[i], **layer.node_args[i])
+
+
+def draw_csp_graph(identifier, screen, graph, node_colors, center, width, height, rel_positions=None,
                    node_background_color=WHITE, outline_color=BLACK, outline_thickness=5, node_radius=50, ID=None):
-    draw_graph(identifier, screen, graph_matrix, center, width, height, rel_positions=rel_positions,
+    draw_graph(identifier, screen, graph, center, width, height, rel_positions=rel_positions,
                outline_color=outline_color, outline_thickness=outline_thickness, node_func=draw_csp_node,
                node_func_args={'interior_color': node_background_color},
                node_fun_args_per_agent=[{'colors': node_colors[i], 'radius': node_radius} for i in range(len(node_colors))])
@@ -182,6 +334,12 @@ def draw_filled_circle(screen, center, radius, interior_color, outline_color=BLA
 
 
 def draw_line(screen, pos1, pos2, color, width):
+    corners = line_corners(pos1, pos2, width)
+    pygame.gfxdraw.aapolygon(screen, corners, color)
+    pygame.gfxdraw.filled_polygon(screen, corners, color)
+
+
+def line_corners(pos1, pos2, width):
     # https://stackoverflow.com/a/30599392
     center = ((pos1[0] + pos2[0]) / 2, (pos1[1] + pos2[1]) / 2)
 
@@ -198,8 +356,7 @@ def draw_line(screen, pos1, pos2, color, width):
     br = (center[0] - (line_length / 2.) * cos(angle) + (width / 2.) * sin(angle),
           center[1] - (width / 2.) * cos(angle) - (line_length / 2.) * sin(angle))
 
-    pygame.gfxdraw.aapolygon(screen, (ul, ur, br, bl), color)
-    pygame.gfxdraw.filled_polygon(screen, (ul, ur, br, bl), color)
+    return ul, ur, br, bl
 
 
 def get_polygon_points(num_sides, center, radius, rotation=0):
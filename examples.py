@@ -0,0 +1,98 @@
+from graph import Graph
+
+
+def get_example(example):
+    initial_assignments = None
+    node_radius = 50
+    if example == 1:
+        graph_matrix = [
+            [0, 1, 1, 0, 0, 0],
+            [1, 0, 1, 1, 0, 0],
+            [1, 1, 0, 1, 1, 0],
+            [0, 1, 1, 0, 1, 1],
+            [0, 0, 1, 1, 0, 1],
+            [0, 0, 0, 1, 1, 0]
+        ]
+        positions = [
+            (0, 0),
+            (1, 1),
+            (1, -1),
+            (3, 1),
+            (3, -1),
+            (4, 0)
+        ]
+        for i in range(len(positions)):
+            positions[i] = (positions[i][0], -positions[i][1])
+    elif example == 2:
+        connections = [
+            [4, 2],
+            [1, 7, 3],
+            [2, 10],
+            [1, 5],
+            [4, 12, 6],
+            [5, 11, 7],
+            [2, 6, 8],
+            [7, 11, 9],
+            [8, 16, 10],
+            [3, 9],
+            [6, 8, 14],
+            [5, 24, 22, 13],
+            [12, 21, 14],
+            [13, 11, 15],
+            [14, 17, 16],
+            [15, 18, 20, 9],
+            [15, 18],
+            [17, 16, 19],
+            [18, 20],
+            [16, 19],
+            [22, 13],
+            [23, 12, 21],
+            [22, 24],
+            [23, 12]
+        ]
+        positions = [
+            (280, 420),
+            (397, 420),
+            (515, 420),
+            (260, 340),
+            (300, 291),
+            (367, 362),
+            (397, 389),
+            (428, 362),
+            (494, 291),
+            (534, 340),
+            (397, 335),
+            (324, 224),
+            (364, 187),
+            (397, 187),
+            (432, 187),
+            (470, 224),
+            (488, 115),
+            (606, 62),
+            (614, 106),
+            (569, 180),
+            (306, 115),
+            (188, 62),
+            (180, 106),
+            (225, 180)
+        ]
+        graph = Graph.from_adjacency([[j - 1 for j in neighbors] for neighbors in connections])
+        node_radius = 25
+    elif example == 3:
+        graph_matrix = [
+            [0, 0, 1],
+            [0, 0, 1],
+            [1, 1, 0]
+        ]
+        positions = [
+            (-1, -1),
+            (1, -1),
+            (0, 0)
+        ]
+        initial_assignments = [0, 1, 1]
+    else:
+        print(f'ERROR: Unknown example {example}')
+        exit()
+    if example != 2:
+        graph = Graph.from_matrix(graph_matrix)
+    return graph, positions, initial_assignments, node_radius
@@ -0,0 +1,165 @@
+import mmap
+import os
+import struct
+from array import array
+
+CSR_MAGIC = b'ABTCSR01'
+CSR_HEADER = struct.Struct('<8sqq')
+
+
+class Graph:
+    # Undirected graph in CSR form: the neighbors of node i are indices[indptr[i]:indptr[i + 1]], sorted. indptr and
+    # indices are array('q') objects, or memoryviews over a memory-mapped file for graphs loaded with load_csr.
+    # graph[i] returns the neighbors of i, so a Graph can be used wherever an adjacency list is expected.
+    def __init__(self, indptr, indices, path=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.path = path
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, index):
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def __reduce__(self):
+        # Memory-mapped graphs are reopened from their file rather than copied when sent to another process
+        if self.path is not None:
+            return load_csr, (self.path,)
+        return Graph, (self.indptr, self.indices)
+
+    @property
+    def num_nodes(self):
+        return len(self)
+
+    @property
+    def num_edges(self):
+        return len(self.indices) // 2
+
+    def neighbors(self, index):
+        return self[index]
+
+    def degree(self, index):
+        return self.indptr[index + 1] - self.indptr[index]
+
+    def edges(self):
+        for i in range(len(self)):
+            for j in self[i]:
+                if i < j:
+                    yield i, j
+
+    @classmethod
+    def from_edges(cls, num_nodes, edges):
+        # Self loops are dropped and duplicate or reversed edges are stored once
+        keys = set()
+        for u, v in edges:
+            if u < 0 or v < 0 or u >= num_nodes or v >= num_nodes:
+                raise ValueError(f'Edge ({u}, {v}) references a node outside of 0..{num_nodes - 1}')
+            if u == v:
+                continue
+            if u > v:
+                u, v = v, u
+            keys.add(u * num_nodes + v)
+        degrees = array('q', bytes(8 * (num_nodes + 1)))
+        for key in keys:
+            degrees[key // num_nodes + 1] += 1
+            degrees[key % num_nodes + 1] += 1
+        indptr = degrees
+        for i in range(num_nodes):
+            indptr[i + 1] += indptr[i]
+        indices = array('q', bytes(8 * indptr[num_nodes]))
+        fill = array('q', indptr[:num_nodes])
+        # Visiting the edges in key order fills every row with its lower neighbors first and then its higher ones,
+        # each in increasing order, so rows come out sorted
+        for key in sorted(keys):
+            u, v = divmod(key, num_nodes)
+            indices[fill[u]] = v
+            fill[u] += 1
+            indices[fill[v]] = u
+            fill[v] += 1
+        return cls(indptr, indices)
+
+    @classmethod
+    def from_adjacency(cls, adjacency):
+        return cls.from_edges(len(adjacency), ((i, j) for i in range(len(adjacency)) for j in adjacency[i]))
+
+    @classmethod
+    def from_matrix(cls, graph_matrix):
+        return cls.from_edges(len(graph_matrix), ((i, j) for i in range(len(graph_matrix))
+                                                 for j in range(len(graph_matrix)) if graph_matrix[i][j] == 1))
+
+    def to_matrix(self):
+        graph_matrix = [[0] * len(self) for _ in range(len(self))]
+        for i, j in self.edges():
+            graph_matrix[i][j] = graph_matrix[j][i] = 1
+        return graph_matrix
+
+
+def as_graph(graph):
+    if isinstance(graph, Graph):
+        return graph
+    return Graph.from_matrix(graph)
+
+
+def load_edge_list(path, num_nodes=None, one_indexed=False):
+    # One edge per line as two whitespace separated node numbers; blank lines and lines starting with # are skipped
+    edges = []
+    offset = 1 if one_indexed else 0
+    largest = -1
+    with open(path) as file:
+        for line in file:
+            parts = line.split()
+            if not parts or parts[0].startswith('#'):
+                continue
+            u, v = int(parts[0]) - offset, int(parts[1]) - offset
+            edges.append((u, v))
+            largest = max(largest, u, v)
+    if num_nodes is None:
+        num_nodes = largest + 1
+    return Graph.from_edges(num_nodes, edges)
+
+
+def load_dimacs(path):
+    # DIMACS graph coloring format: 'c' comment lines, one 'p edge <nodes> <edges>' line and 'e <u> <v>' lines with
+    # nodes numbered from 1
+    num_nodes = None
+    edges = []
+    with open(path) as file:
+        for line in file:
+            parts = line.split()
+            if not parts or parts[0] == 'c':
+                continue
+            if parts[0] == 'p':
+                num_nodes = int(parts[2])
+            elif parts[0] == 'e':
+                edges.append((int(parts[1]) - 1, int(parts[2]) - 1))
+    if num_nodes is None:
+        raise ValueError(f'{path} has no problem line')
+    return Graph.from_edges(num_nodes, edges)
+
+
+def save_csr(graph, path):
+    with open(path, 'wb') as file:
+        file.write(CSR_HEADER.pack(CSR_MAGIC, len(graph), len(graph.indices)))
+        file.write(array('q', graph.indptr).tobytes())
+        file.write(array('q', graph.indices).tobytes())
+
+
+def load_csr(path):
+    # The arrays are memory-mapped, so only the pages that are actually visited are read into memory
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, num_nodes, num_indices = CSR_HEADER.unpack_from(mapped)
+    if magic != CSR_MAGIC:
+        raise ValueError(f'{path} is not a CSR graph file')
+    view = memoryview(mapped)[CSR_HEADER.size:].cast('q')
+    return Graph(view[:num_nodes + 1], view[num_nodes + 1:num_nodes + 1 + num_indices], path=path)
+
+
+def load_graph(path):
+    extension = os.path.splitext(path)[1]
+    if extension == '.col':
+        return load_dimacs(path)
+    if extension == '.csr':
+        return load_csr(path)
+    return load_edge_list(path)
@@ -1,15 +1,38 @@
-import random
-
 import pygame
 import drawing_utils
 import ctypes
 
-from Agent import Agent
+from background import SolverThread
 from drawing_utils import GraphMessageAnimation
+from examples import get_example
+from graph import load_graph
+from ordering import INDEX
+from recording import TraceReader, NO_SOLUTION_VALUE
+from scheduling import READY_QUEUE, make_scheduler
+from simulation import build_agents, Simulation
+from termination import TerminationDetector
 
 NUM_COLORS = 3
 WINDOW_OUTLINE = 25
 EXAMPLE = 2
+# Which agents run each frame: READY_QUEUE activates the next agent that has mail, SYNCHRONOUS every agent with mail,
+# RANDOM one ready agent picked at random and PRIORITY the ready agents in rounds by priority (see scheduling.py)
+SCHEDULER = READY_QUEUE
+# ABT priority ordering of the agents: INDEX, MAX_DEGREE, SMALLEST_LAST or DSATUR (see ordering.py)
+ORDERING = INDEX
+# Set REPLAY_FILE to a trace written by simulation.py --record to replay it instead of running the agents. The trace is
+# drawn on REPLAY_GRAPH if set, otherwise on EXAMPLE. Space pauses, left/right step a cycle (10 with shift), home/end
+# jump to the start/end and up/down double/halve REPLAY_SPEED, which is in cycles per second
+REPLAY_FILE = None
+REPLAY_GRAPH = None
+REPLAY_SPEED = 2
+# With BACKGROUND_SOLVER the agents run in a separate thread and the window only shows the latest state it published.
+# SPEED_UP is how many synchronous cycles it runs per second, or None to run at full speed
+BACKGROUND_SOLVER = False
+SPEED_UP = 1
+# Messages are only animated while cycles last long enough to see them, and at most this many per cycle
+MAX_ANIMATED_SPEED = 10
+MAX_ANIMATED_MESSAGES = 500
 
 
 def main():
@@ -21,120 +44,25 @@ def main():
     pygame.display.set_caption("Multi Agent Systems Simulation")
     clock = pygame.time.Clock()
 
-    initial_assignments = None
-    node_radius = 50
-    if EXAMPLE == 1:
-        graph_matrix = [
-            [0, 1, 1, 0, 0, 0],
-            [1, 0, 1, 1, 0, 0],
-            [1, 1, 0, 1, 1, 0],
-            [0, 1, 1, 0, 1, 1],
-            [0, 0, 1, 1, 0, 1],
-            [0, 0, 0, 1, 1, 0]
-        ]
-        positions = [
-            (0, 0),
-            (1, 1),
-            (1, -1),
-            (3, 1),
-            (3, -1),
-            (4, 0)
-        ]
-        for i in range(len(positions)):
-            positions[i] = (positions[i][0], -positions[i][1])
-    elif EXAMPLE == 2:
-        connections = [
-            [4, 2],
-            [1, 7, 3],
-            [2, 10],
-            [1, 5],
-            [4, 12, 6],
-            [5, 11, 7],
-            [2, 6, 8],
-            [7, 11, 9],
-            [8, 16, 10],
-            [3, 9],
-            [6, 8, 14],
-            [5, 24, 22, 13],
-            [12, 21, 14],
-            [13, 11, 15],
-            [14, 17, 16],
-            [15, 18, 20, 9],
-            [15, 18],
-            [17, 16, 19],
-            [18, 20],
-            [16, 19],
-            [22, 13],
-            [23, 12, 21],
-            [22, 24],
-            [23, 12]
-        ]
-        positions = [
-            (280, 420),
-            (397, 420),
-            (515, 420),
-            (260, 340),
-            (300, 291),
-            (367, 362),
-            (397, 389),
-            (428, 362),
-            (494, 291),
-            (534, 340),
-            (397, 335),
-            (324, 224),
-            (364, 187),
-            (397, 187),
-            (432, 187),
-            (470, 224),
-            (488, 115),
-            (606, 62),
-            (614, 106),
-            (569, 180),
-            (306, 115),
-            (188, 62),
-            (180, 106),
-            (225, 180)
-        ]
-        graph_matrix = []
-        for i in range(len(connections)):
-            graph_matrix.append([])
-            for j in range(len(connections)):
-                if j + 1 in connections[i]:
-                    graph_matrix[i].append(1)
-                else:
-                    graph_matrix[i].append(0)
-        node_radius = 25
-    if EXAMPLE == 3:
-        graph_matrix = [
-            [0, 0, 1],
-            [0, 0, 1],
-            [1, 1, 0]
-        ]
-        positions = [
-            (-1, -1),
-            (1, -1),
-            (0, 0)
-        ]
-        initial_assignments = [0, 1, 1]
-
-    agents = []
-    for i in range(len(graph_matrix)):
-        if initial_assignments is not None:
-            agents.append(Agent(i, list(range(NUM_COLORS)), verbose=True, initial_assignment=initial_assignments[i]))
-        else:
-            agents.append(
-                Agent(i, list(range(NUM_COLORS)), verbose=True, initial_assignment=random.randint(0, NUM_COLORS - 1)))
-    for i in range(len(graph_matrix)):
-        neighbors = []
-        for j in range(len(graph_matrix)):
-            if i != j and graph_matrix[i][j] == 1:
-                neighbors.append(agents[j])
-        agents[i].set_neighbors(neighbors)
-
-    frame = 0
-    while True:
-        frame += 1
+    graph, positions, initial_assignments, node_radius = get_example(EXAMPLE)
+    if REPLAY_FILE is not None:
+        if REPLAY_GRAPH is not None:
+            graph, positions = load_graph(REPLAY_GRAPH), None
+        replay(screen, clock, graph, positions, node_radius)
+        return
+    if BACKGROUND_SOLVER:
+        watch(screen, clock, graph, positions, initial_assignments, node_radius)
+        return
+    agents = build_agents(graph, NUM_COLORS, initial_assignments=initial_assignments, ordering=ORDERING, verbose=True)
+    scheduler = make_scheduler(SCHEDULER, agents)
+    detector = TerminationDetector(agents)
+    reported = False
+
+    def deliver(agent, message):
+        agent.message(message)
+        scheduler.notify(agent)
 
+    while True:
         clock.tick(60)
 
         # Handle events
@@ -146,24 +74,27 @@ def main():
                 return
 
         screen.fill((255, 255, 255))
-        messages = agents[frame % len(agents)].process_messages()
+        messages = []
+        for agent in scheduler.next_batch():
+            detector.activating(agent)
+            agent_messages = agent.process_messages()
+            detector.activated(agent, agent_messages)
+            messages.extend(agent_messages)
         times = {}
         for msg in messages:
-            message_type = msg['message'][0]
-            if message_type == 'indirect':
-                message_type = msg['message'][1][1][0]
-            source_index = msg['source'].index
-            target_index = msg['agent'].index
+            message_type = msg.message_type
+            source_index = msg.source.index
+            target_index = msg.agent.index
             if source_index * len(agents) + target_index not in times:
                 times[source_index * len(agents) + target_index] = 0
             delay = times[source_index * len(agents) + target_index] * 20
             drawing_utils.add_animation(
                 GraphMessageAnimation('Graph1', source_index, target_index, message_type,
-                                      callback=lambda agent, message: agent.message(message),
-                                      callback_params=[msg['agent'], msg['message']], delay=delay))
+                                      callback=deliver,
+                                      callback_params=[msg.agent, msg.message], delay=delay))
             times[source_index * len(agents) + target_index] += 1
 
-        drawing_utils.draw_csp_graph('Graph1', screen, graph_matrix, node_colors=[
+        drawing_utils.draw_csp_graph('Graph1', screen, graph, node_colors=[
             [-1] if agent.no_sol else [agent.number] if agent.number is not None else list(range(NUM_COLORS))
             for agent in agents],
                                      center=(screen_width / 2, screen_height / 2),
@@ -171,6 +102,123 @@ def main():
                                      rel_positions=positions, node_radius=node_radius)
         pygame.display.flip()
         drawing_utils.step()
+        if not reported and detector.terminated():
+            report(detector)
+            reported = True
+
+
+def report(detector):
+    if detector.no_solution:
+        print('No solution')
+    elif detector.converged:
+        print(f'Converged to a verified coloring in {detector.time_to_convergence:.2f} seconds')
+    else:
+        print('ERROR: Agents stopped without a valid coloring')
+
+
+def watch(screen, clock, graph, positions, initial_assignments, node_radius):
+    screen_width, screen_height = screen.get_size()
+    agents = build_agents(graph, NUM_COLORS, initial_assignments=initial_assignments, ordering=ORDERING)
+    solver = SolverThread(Simulation(agents, scheduler=make_scheduler(SCHEDULER, agents)), cycles_per_second=SPEED_UP,
+                          max_messages=MAX_ANIMATED_MESSAGES)
+    solver.start()
+    shown_cycle = None
+    reported = False
+    while True:
+        clock.tick(60)
+
+        # Handle events
+        for event in pygame.event.get():
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    solver.stop()
+                    return
+            if event.type == pygame.QUIT:
+                solver.stop()
+                return
+
+        snapshot = solver.snapshot
+        if snapshot.cycle != shown_cycle:
+            drawing_utils.clear_animations('Graph1')
+            if SPEED_UP is not None and SPEED_UP <= MAX_ANIMATED_SPEED:
+                for source_index, target_index, message_type in snapshot.messages:
+                    drawing_utils.add_animation(
+                        GraphMessageAnimation('Graph1', source_index, target_index, message_type))
+            shown_cycle = snapshot.cycle
+
+        screen.fill((255, 255, 255))
+        drawing_utils.draw_csp_graph('Graph1', screen, graph, node_colors=[
+            [-1] if no_sol else [number] if number is not None else list(range(NUM_COLORS))
+            for number, no_sol in zip(snapshot.numbers, snapshot.no_sol)],
+                                     center=(screen_width / 2, screen_height / 2),
+                                     width=screen_width - WINDOW_OUTLINE * 2, height=screen_height - WINDOW_OUTLINE * 2,
+                                     rel_positions=positions, node_radius=node_radius)
+        pygame.display.flip()
+        drawing_utils.step()
+        if not reported and snapshot.done:
+            report(solver.simulation.detector)
+            reported = True
+
+
+def replay(screen, clock, graph, positions, node_radius):
+    screen_width, screen_height = screen.get_size()
+    reader = TraceReader(REPLAY_FILE)
+    if reader.num_nodes != len(graph):
+        print(f'ERROR: Trace has {reader.num_nodes} agents but the graph has {len(graph)} nodes')
+        exit()
+    speed = REPLAY_SPEED
+    position = 0.0
+    paused = False
+    shown_cycle = None
+    while True:
+        clock.tick(60)
+
+        # Handle events
+        for event in pygame.event.get():
+            if event.type == pygame.KEYDOWN:
+                step = 10 if event.mod & pygame.KMOD_SHIFT else 1
+                if event.key == pygame.K_ESCAPE:
+                    return
+                elif event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    position = int(position) + step
+                elif event.key == pygame.K_LEFT:
+                    position = int(position) - step
+                elif event.key == pygame.K_HOME:
+                    position = 0
+                elif event.key == pygame.K_END:
+                    position = reader.num_cycles - 1
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed /= 2
+            if event.type == pygame.QUIT:
+                return
+
+        if not paused:
+            position += speed / 60
+        position = max(0, min(position, reader.num_cycles - 1))
+        cycle = int(position)
+        if cycle != shown_cycle:
+            drawing_utils.clear_animations('Graph1')
+            if speed <= MAX_ANIMATED_SPEED:
+                _, messages = reader.read_cycle(cycle)
+                for source_index, target_index, message_type in messages[:MAX_ANIMATED_MESSAGES]:
+                    drawing_utils.add_animation(
+                        GraphMessageAnimation('Graph1', source_index, target_index, message_type))
+            shown_cycle = cycle
+        colors = reader.colors_at(cycle)
+
+        screen.fill((255, 255, 255))
+        drawing_utils.draw_csp_graph('Graph1', screen, graph, node_colors=[
+            [-1] if number == NO_SOLUTION_VALUE else [number] if number is not None else list(range(NUM_COLORS))
+            for number in colors],
+                                     center=(screen_width / 2, screen_height / 2),
+                                     width=screen_width - WINDOW_OUTLINE * 2, height=screen_height - WINDOW_OUTLINE * 2,
+                                     rel_positions=positions, node_radius=node_radius)
+        pygame.display.flip()
+        drawing_utils.step()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+OK = 'ok'
+NO_GOOD = 'no_good'
+CONNECTION_REQUEST = 'connection_request'
+CONNECTION_SUCCESSFUL = 'connection_successful'
+INDIRECT = 'indirect'
+NO_SOLUTION = 'no_solution'
+
+
+class Envelope:
+    __slots__ = ('source', 'agent', 'message')
+
+    def __init__(self, source, agent, message):
+        self.source = source
+        self.agent = agent
+        self.message = message
+
+    @property
+    def message_type(self):
+        message = self.message
+        if message[0] == INDIRECT:
+            message = message[1].message
+        return message[0]
+
+
+class Route:
+    # The content of an INDIRECT message: the full path it was sent along, shared by every hop, and the position in
+    # that path of the agent it goes to next
+    __slots__ = ('path', 'hop', 'message')
+
+    def __init__(self, path, hop, message):
+        self.path = path
+        self.hop = hop
+        self.message = message
+
+    def __repr__(self):
+        return f'Route({self.path[self.hop:]}, {self.message})'
@@ -0,0 +1,204 @@
+import sys
+from types import MappingProxyType
+
+OLDEST = 'oldest'
+LARGEST = 'largest'
+
+# Shared by every store until it adds its first nogood, since most agents never get one
+NO_ENTRIES = MappingProxyType({})
+
+
+class NogoodStore:
+    # Nogoods are indexed by the (agent index, value) pairs they mention for agents other than the owner, in the
+    # spirit of watched literals. Each nogood keeps a count of its pairs that do not hold in the owner's agent_view,
+    # so a change to one entry of the agent_view only touches the nogoods that mention that agent. A nogood whose
+    # count reaches zero is active and forbids the owner's value it contains (or every value if it has none).
+    #
+    # With forget_obsolete, nogoods that mention a value the agent_view no longer holds are dropped, as in ABT with
+    # nogood deletion, so the store only keeps nogoods compatible with the current agent_view. max_size additionally
+    # caps the store, evicting inactive nogoods according to eviction. Active nogoods are what rules out the agent's
+    # values and ABT only terminates if they are kept, so they are never evicted: while every stored nogood is active
+    # the store grows past max_size and shrinks back once some become inactive.
+    #
+    # option_bits maps each of the owner's values to a bit; blocked_mask then holds the bits of every value forbidden
+    # by an active nogood and blocks_all counts active nogoods that do not mention the owner at all.
+    __slots__ = ('owner_index', 'forget_obsolete', 'max_size', 'eviction', 'no_goods', 'ids', 'watches', 'active',
+                 'option_bits', 'blocked_mask', 'blocks_all', 'next_id', 'peak_size', 'added', 'forgotten', 'evicted')
+
+    def __init__(self, owner_index, forget_obsolete=False, max_size=None, eviction=OLDEST, option_bits=None):
+        if eviction not in (OLDEST, LARGEST):
+            print(f'ERROR: Invalid nogood eviction strategy {eviction}')
+            exit()
+        self.owner_index = owner_index
+        self.forget_obsolete = forget_obsolete
+        self.max_size = max_size
+        self.eviction = eviction
+        self.no_goods = NO_ENTRIES
+        self.ids = NO_ENTRIES
+        self.watches = NO_ENTRIES
+        self.active = NO_ENTRIES
+        self.option_bits = option_bits if option_bits is not None else {}
+        self.blocked_mask = 0
+        self.blocks_all = 0
+        self.next_id = 0
+        self.peak_size = 0
+        self.added = 0
+        self.forgotten = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.no_goods)
+
+    def __iter__(self):
+        return (no_good for no_good, _, _ in self.no_goods.values())
+
+    def add(self, no_good, agent_view):
+        key = frozenset(no_good)
+        if key in self.ids:
+            return None
+        own_value = None
+        unmatched = 0
+        for index, number in no_good:
+            if index == self.owner_index:
+                own_value = number
+                continue
+            view_number = agent_view.get(index)
+            if view_number != number:
+                if self.forget_obsolete and view_number is not None:
+                    self.forgotten += 1
+                    return None
+                unmatched += 1
+        if self.no_goods is NO_ENTRIES:
+            self.no_goods = {}
+            self.ids = {}
+            self.watches = {}
+            self.active = {}
+        no_good_id = self.next_id
+        self.next_id += 1
+        for index, number in no_good:
+            if index != self.owner_index:
+                self.watches.setdefault(index, {}).setdefault(number, set()).add(no_good_id)
+        self.no_goods[no_good_id] = [no_good, own_value, unmatched]
+        self.ids[key] = no_good_id
+        if unmatched == 0:
+            self.activate(no_good_id, own_value)
+        self.added += 1
+        if self.max_size is not None and len(self.no_goods) > self.max_size:
+            self.evict()
+        self.peak_size = max(self.peak_size, len(self.no_goods))
+        return no_good_id
+
+    def evict(self):
+        # Removes inactive nogoods until the store is back at max_size or only active ones are left
+        inactive = [no_good_id for no_good_id, record in self.no_goods.items() if record[2]]
+        if self.eviction == LARGEST:
+            inactive.sort(key=lambda no_good_id: len(self.no_goods[no_good_id][0]), reverse=True)
+        for no_good_id in inactive[:len(self.no_goods) - self.max_size]:
+            self.remove(no_good_id)
+            self.evicted += 1
+
+    def remove(self, no_good_id):
+        no_good, own_value, unmatched = self.no_goods.pop(no_good_id)
+        del self.ids[frozenset(no_good)]
+        for index, number in no_good:
+            if index == self.owner_index:
+                continue
+            watches = self.watches[index]
+            watchers = watches[number]
+            watchers.discard(no_good_id)
+            if not watchers:
+                del watches[number]
+                if not watches:
+                    del self.watches[index]
+        if unmatched == 0:
+            self.deactivate(no_good_id, own_value)
+
+    def update(self, index, old_number, new_number):
+        # Called whenever the owner's agent_view entry for index changes, None meaning no entry
+        watches = self.watches.get(index)
+        if not watches:
+            return
+        if self.forget_obsolete and new_number is not None:
+            obsolete = [no_good_id for number, watchers in watches.items() if number != new_number
+                        for no_good_id in watchers]
+            for no_good_id in obsolete:
+                self.remove(no_good_id)
+            self.forgotten += len(obsolete)
+            watches = self.watches.get(index, {})
+        deactivated = False
+        if old_number is not None:
+            for no_good_id in watches.get(old_number, ()):
+                record = self.no_goods[no_good_id]
+                if record[2] == 0:
+                    self.deactivate(no_good_id, record[1])
+                    deactivated = True
+                record[2] += 1
+        if new_number is not None:
+            for no_good_id in watches.get(new_number, ()):
+                record = self.no_goods[no_good_id]
+                record[2] -= 1
+                if record[2] == 0:
+                    self.activate(no_good_id, record[1])
+        # A store that grew past max_size while all its nogoods were active shrinks once some of them are not
+        if deactivated and self.max_size is not None and len(self.no_goods) > self.max_size:
+            self.evict()
+
+    def activate(self, no_good_id, own_value):
+        active = self.active.setdefault(own_value, set())
+        active.add(no_good_id)
+        if own_value is None:
+            self.blocks_all += 1
+        elif len(active) == 1:
+            self.blocked_mask |= self.option_bits.get(own_value, 0)
+
+    def deactivate(self, no_good_id, own_value):
+        active = self.active[own_value]
+        active.discard(no_good_id)
+        if own_value is None:
+            self.blocks_all -= 1
+        elif not active:
+            self.blocked_mask &= ~self.option_bits.get(own_value, 0)
+
+    def update_option_bits(self, option_bits):
+        # Called after the owner's option_bits changed
+        self.option_bits = option_bits
+        self.blocked_mask = 0
+        for own_value, active in self.active.items():
+            if own_value is not None and active:
+                self.blocked_mask |= self.option_bits.get(own_value, 0)
+
+    def clear(self):
+        self.forgotten += len(self.no_goods)
+        self.no_goods = NO_ENTRIES
+        self.ids = NO_ENTRIES
+        self.watches = NO_ENTRIES
+        self.active = NO_ENTRIES
+        self.blocked_mask = 0
+        self.blocks_all = 0
+
+    def is_blocked(self, number):
+        return self.blocks_all > 0 or bool(self.active.get(number))
+
+    def reasons(self, number):
+        # The pairs, other than the owner's own, of every active nogood that forbids number
+        for own_value in (None, number):
+            for no_good_id in self.active.get(own_value, ()):
+                yield [(index, value) for index, value in self.no_goods[no_good_id][0] if index != self.owner_index]
+
+    def stats(self):
+        size_in_bytes = sys.getsizeof(self.no_goods) + sys.getsizeof(self.ids) + sys.getsizeof(self.watches)
+        pairs = 0
+        for no_good, _, _ in self.no_goods.values():
+            pairs += len(no_good)
+            size_in_bytes += sys.getsizeof(no_good) + sum(sys.getsizeof(pair) for pair in no_good)
+        for watches in self.watches.values():
+            size_in_bytes += sys.getsizeof(watches) + sum(sys.getsizeof(watchers) for watchers in watches.values())
+        return {
+            'size': len(self.no_goods),
+            'peak_size': self.peak_size,
+            'pairs': pairs,
+            'bytes': size_in_bytes,
+            'added': self.added,
+            'forgotten': self.forgotten,
+            'evicted': self.evicted,
+        }
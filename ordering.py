@@ -0,0 +1,99 @@
+import heapq
+
+INDEX = 'index'
+MAX_DEGREE = 'max_degree'
+SMALLEST_LAST = 'smallest_last'
+DSATUR = 'dsatur'
+ORDERINGS = [INDEX, MAX_DEGREE, SMALLEST_LAST, DSATUR]
+
+
+# An ordering lists the nodes from the highest ABT priority to the lowest. graph is a Graph or anything where
+# graph[index] lists the neighbors of index.
+
+def index_order(graph):
+    return list(range(len(graph)))
+
+
+def max_degree_order(graph):
+    # Nodes with more neighbors first, so the most constrained agents settle their values before the others
+    return sorted(range(len(graph)), key=lambda index: (-len(graph[index]), index))
+
+
+def smallest_last_order(graph):
+    # Repeatedly removes a node of smallest degree in what is left of the graph and gives the nodes removed last the
+    # highest priority. Every node then has at most degeneracy many higher priority neighbors.
+    num_nodes = len(graph)
+    degrees = [len(graph[index]) for index in range(num_nodes)]
+    buckets = [set() for _ in range(max(degrees, default=0) + 1)]
+    for index, degree in enumerate(degrees):
+        buckets[degree].add(index)
+    removed = [False] * num_nodes
+    order = []
+    smallest = 0
+    for _ in range(num_nodes):
+        smallest = max(smallest - 1, 0)
+        while not buckets[smallest]:
+            smallest += 1
+        index = min(buckets[smallest])
+        buckets[smallest].remove(index)
+        removed[index] = True
+        order.append(index)
+        for neighbor in graph[index]:
+            if not removed[neighbor]:
+                buckets[degrees[neighbor]].remove(neighbor)
+                degrees[neighbor] -= 1
+                buckets[degrees[neighbor]].add(neighbor)
+    order.reverse()
+    return order
+
+
+def dsatur_order(graph):
+    # The order in which DSATUR greedily colors the graph: next is always the node whose colored neighbors already use
+    # the most distinct colors, ties going to the node with the most uncolored neighbors
+    num_nodes = len(graph)
+    colors = [None] * num_nodes
+    saturation = [set() for _ in range(num_nodes)]
+    uncolored_degrees = [len(graph[index]) for index in range(num_nodes)]
+    heap = [(0, -degree, index) for index, degree in enumerate(uncolored_degrees)]
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        negative_saturation, negative_degree, index = heapq.heappop(heap)
+        # Entries are pushed again whenever a node's key changes, so skip the outdated ones
+        if colors[index] is not None or (-negative_saturation, -negative_degree) != (len(saturation[index]),
+                                                                                     uncolored_degrees[index]):
+            continue
+        color = 0
+        while color in saturation[index]:
+            color += 1
+        colors[index] = color
+        order.append(index)
+        for neighbor in graph[index]:
+            if colors[neighbor] is None:
+                saturation[neighbor].add(color)
+                uncolored_degrees[neighbor] -= 1
+                heapq.heappush(heap, (-len(saturation[neighbor]), -uncolored_degrees[neighbor], neighbor))
+    return order
+
+
+def make_order(ordering, graph):
+    if ordering == INDEX:
+        return index_order(graph)
+    if ordering == MAX_DEGREE:
+        return max_degree_order(graph)
+    if ordering == SMALLEST_LAST:
+        return smallest_last_order(graph)
+    if ordering == DSATUR:
+        return dsatur_order(graph)
+    raise ValueError(f'Unknown ordering {ordering}')
+
+
+def make_ranks(ordering, graph):
+    # ranks[index] is the position of index in the ordering, which agents compare in place of their indices. The index
+    # ordering needs no table, so it returns None.
+    if ordering == INDEX:
+        return None
+    ranks = [0] * len(graph)
+    for rank, index in enumerate(make_order(ordering, graph)):
+        ranks[index] = rank
+    return ranks
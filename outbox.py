@@ -0,0 +1,34 @@
+from messages import OK, INDIRECT
+
+
+def ok_key(envelope):
+    # OK messages are only merged on the same channel, the direct link to the recipient or one route to it, so the one
+    # that is kept arrives after everything sent before it on that channel. Messages the agent relays for others are
+    # never merged, the agent that sent them already did
+    message = envelope.message
+    if message[0] == OK:
+        if message[1][0] != envelope.source.index:
+            return None
+        return envelope.agent.index, message[1][0]
+    if message[0] == INDIRECT and message[1].message[0] == OK:
+        route = message[1]
+        if route.message[1][0] != envelope.source.index:
+            return None
+        return tuple(route.path), route.message[1][0]
+    return None
+
+
+def coalesce_ok_messages(envelopes):
+    # Of several OK messages announcing the same agent's value to the same recipient only the last one matters. Keep
+    # it in its own position and drop the earlier ones; every other message keeps its relative order
+    latest = set()
+    kept = []
+    for envelope in reversed(envelopes):
+        key = ok_key(envelope)
+        if key is not None:
+            if key in latest:
+                continue
+            latest.add(key)
+        kept.append(envelope)
+    kept.reverse()
+    return kept, len(envelopes) - len(kept)
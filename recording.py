@@ -0,0 +1,100 @@
+import struct
+
+from messages import OK, NO_GOOD, CONNECTION_REQUEST, CONNECTION_SUCCESSFUL, NO_SOLUTION
+
+TRACE_MAGIC = b'ABTTRC01'
+TRACE_HEADER = struct.Struct('<8sq')
+# Every record is a kind followed by three integers: a cycle marker holds the cycle number, an assignment the agent
+# and its new value (-1 once it learned there is no solution) and a message its source, target and type
+RECORD = struct.Struct('<Biii')
+CYCLE = 0
+ASSIGNMENT = 1
+MESSAGE = 2
+MESSAGE_TYPES = [OK, NO_GOOD, CONNECTION_REQUEST, CONNECTION_SUCCESSFUL, NO_SOLUTION]
+MESSAGE_CODES = {message_type: code for code, message_type in enumerate(MESSAGE_TYPES)}
+NO_SOLUTION_VALUE = -1
+KEYFRAME_INTERVAL = 256
+
+
+class TraceWriter:
+    # Appends records to the file as the simulation runs, so nothing but the write buffer is kept in memory
+    def __init__(self, path, num_nodes):
+        self.file = open(path, 'wb', buffering=1 << 20)
+        self.file.write(TRACE_HEADER.pack(TRACE_MAGIC, num_nodes))
+
+    def cycle(self, cycle):
+        self.file.write(RECORD.pack(CYCLE, cycle, 0, 0))
+
+    def assignment(self, index, number):
+        self.file.write(RECORD.pack(ASSIGNMENT, index, number, 0))
+
+    def message(self, source_index, target_index, message_type):
+        self.file.write(RECORD.pack(MESSAGE, source_index, target_index, MESSAGE_CODES[message_type]))
+
+    def close(self):
+        self.file.close()
+
+
+class TraceReader:
+    # Opening a trace scans it once to remember where every cycle starts and the colors at the start of every
+    # KEYFRAME_INTERVAL-th cycle. Any cycle can then be read straight from the file, and the colors at any cycle are
+    # rebuilt from the closest earlier keyframe, so seeking in either direction is cheap and the trace itself is never
+    # held in memory.
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        magic, self.num_nodes = TRACE_HEADER.unpack(self.file.read(TRACE_HEADER.size))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f'{path} is not an ABT trace file')
+        self.offsets = []
+        self.keyframes = []
+        colors = [None] * self.num_nodes
+        offset = TRACE_HEADER.size
+        while True:
+            chunk = self.file.read(RECORD.size * 65536)
+            if not chunk:
+                break
+            for kind, a, b, _ in RECORD.iter_unpack(chunk):
+                if kind == CYCLE:
+                    if len(self.offsets) % KEYFRAME_INTERVAL == 0:
+                        self.keyframes.append(list(colors))
+                    self.offsets.append(offset)
+                elif kind == ASSIGNMENT:
+                    colors[a] = b
+                offset += RECORD.size
+        self.offsets.append(offset)
+        self.position = 0
+        self.colors = list(self.keyframes[0]) if self.keyframes else colors
+
+    @property
+    def num_cycles(self):
+        return len(self.offsets) - 1
+
+    def read_cycle(self, cycle):
+        # Returns the assignments made during the cycle and the messages sent in it, as (source, target, type)
+        self.file.seek(self.offsets[cycle])
+        assignments = []
+        messages = []
+        for kind, a, b, c in RECORD.iter_unpack(self.file.read(self.offsets[cycle + 1] - self.offsets[cycle])):
+            if kind == ASSIGNMENT:
+                assignments.append((a, b))
+            elif kind == MESSAGE:
+                messages.append((a, b, MESSAGE_TYPES[c]))
+        return assignments, messages
+
+    def colors_at(self, cycle):
+        # The value of every agent after the given cycle as a tuple, None for agents that have not picked one yet. The
+        # reader keeps its own list to seek from, so callers never get hold of it
+        if not self.num_cycles:
+            return tuple(self.colors)
+        cycle = max(0, min(cycle, self.num_cycles - 1))
+        if cycle + 1 < self.position or cycle // KEYFRAME_INTERVAL > self.position // KEYFRAME_INTERVAL:
+            self.position = cycle // KEYFRAME_INTERVAL * KEYFRAME_INTERVAL
+            self.colors = list(self.keyframes[cycle // KEYFRAME_INTERVAL])
+        while self.position <= cycle:
+            for index, number in self.read_cycle(self.position)[0]:
+                self.colors[index] = number
+            self.position += 1
+        return tuple(self.colors)
+
+    def close(self):
+        self.file.close()
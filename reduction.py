@@ -0,0 +1,165 @@
+import argparse
+import multiprocessing
+import random
+import time
+from collections import Counter, deque
+
+from examples import get_example
+from graph import Graph, as_graph, load_graph
+from ordering import INDEX, ORDERINGS
+from routing import DFS, SHORTEST_PATH
+from scheduling import SCHEDULERS, SYNCHRONOUS
+from simulation import solve as solve_simulation
+from termination import verify_graph_coloring
+
+
+def peel(graph, num_colors):
+    # Repeatedly removes nodes with fewer than num_colors neighbors left. Returns the nodes in the order they were
+    # removed and the rest, the num_colors-core. Colored in reverse removal order each removed node has fewer than
+    # num_colors colored neighbors, so a color is always left for it.
+    num_nodes = len(graph)
+    degrees = [len(graph[index]) for index in range(num_nodes)]
+    removed = [False] * num_nodes
+    queue = deque(index for index in range(num_nodes) if degrees[index] < num_colors)
+    for index in queue:
+        removed[index] = True
+    peeled = []
+    while queue:
+        index = queue.popleft()
+        peeled.append(index)
+        for neighbor in graph[index]:
+            degrees[neighbor] -= 1
+            if not removed[neighbor] and degrees[neighbor] < num_colors:
+                removed[neighbor] = True
+                queue.append(neighbor)
+    return peeled, [index for index in range(num_nodes) if not removed[index]]
+
+
+def components(graph, nodes):
+    # Connected components of the subgraph induced by nodes, each as a sorted list of nodes
+    inside = set(nodes)
+    seen = set()
+    result = []
+    for root in nodes:
+        if root in seen:
+            continue
+        seen.add(root)
+        component = [root]
+        queue = deque([root])
+        while queue:
+            index = queue.popleft()
+            for neighbor in graph[index]:
+                if neighbor in inside and neighbor not in seen:
+                    seen.add(neighbor)
+                    component.append(neighbor)
+                    queue.append(neighbor)
+        component.sort()
+        result.append(component)
+    return result
+
+
+def subgraph(graph, nodes):
+    # The subgraph induced by nodes, where node i of the subgraph is nodes[i] of graph
+    local = {index: i for i, index in enumerate(nodes)}
+    return Graph.from_edges(len(nodes), ((i, local[neighbor]) for i, index in enumerate(nodes)
+                                         for neighbor in graph[index] if neighbor in local))
+
+
+def color_back(graph, coloring, peeled, num_colors):
+    # Gives the peeled nodes, last removed first, the smallest color none of their colored neighbors has
+    for index in reversed(peeled):
+        used = {coloring[neighbor] for neighbor in graph[index]}
+        coloring[index] = next(number for number in range(num_colors) if number not in used)
+    return coloring
+
+
+def solve_component(arguments):
+    graph, num_colors, initial_assignments, seed, max_cycles, options = arguments
+    return solve_simulation(graph, num_colors, initial_assignments=initial_assignments, seed=seed,
+                            max_cycles=max_cycles, **options)
+
+
+def solve(graph, num_colors, initial_assignments=None, seed=None, max_cycles=None, processes=1, **options):
+    # Peels the graph down to its num_colors-core, solves every connected component of the core as its own ABT run,
+    # across a pool of processes if processes > 1, and then colors the peeled nodes back in. The components run side by
+    # side, so cycles and NCCC are the largest of any component while messages and checks are totals.
+    start = time.perf_counter()
+    graph = as_graph(graph)
+    if initial_assignments is None:
+        rng = random.Random(seed)
+        initial_assignments = [rng.randint(0, num_colors - 1) for _ in range(len(graph))]
+    peeled, core = peel(graph, num_colors)
+    parts = components(graph, core)
+    tasks = [(subgraph(graph, nodes), num_colors, [initial_assignments[index] for index in nodes], seed, max_cycles,
+              options) for nodes in parts]
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(processes, len(tasks))) as pool:
+            results = pool.map(solve_component, tasks)
+    else:
+        results = [solve_component(task) for task in tasks]
+
+    no_sol = any(result['no_solution'] for result in results)
+    coloring = [None] * len(graph)
+    if not no_sol:
+        for nodes, result in zip(parts, results):
+            for index, number in zip(nodes, result['coloring']):
+                coloring[index] = number
+        color_back(graph, coloring, peeled, num_colors)
+    wall_time = time.perf_counter() - start
+    converged = not no_sol and verify_graph_coloring(graph, coloring, num_colors)
+    message_counts = sum((Counter(result['message_counts']) for result in results), Counter())
+    stores = [result['no_good_store'] for result in results]
+    return {
+        'coloring': None if no_sol else coloring,
+        'no_solution': no_sol,
+        'quiescent': all(result['quiescent'] for result in results),
+        'converged': converged,
+        'time_to_convergence': wall_time if converged else None,
+        'peeled': len(peeled),
+        'components': len(parts),
+        'largest_component': max((len(nodes) for nodes in parts), default=0),
+        'cycles': max((result['cycles'] for result in results), default=0),
+        'activations': sum(result['activations'] for result in results),
+        'constraint_checks': sum(result['constraint_checks'] for result in results),
+        'nccc': max((result['nccc'] for result in results), default=0),
+        'messages': sum(message_counts.values()),
+        'message_counts': dict(message_counts),
+        'agent_stats': dict(sum((Counter(result['agent_stats']) for result in results), Counter())),
+        'no_good_store': {
+            'size': sum(store['size'] for store in stores),
+            'peak_size': max((store['peak_size'] for store in stores), default=0),
+            'bytes': sum(store['bytes'] for store in stores),
+            'forgotten': sum(store['forgotten'] for store in stores),
+            'evicted': sum(store['evicted'] for store in stores),
+        },
+        'wall_time': wall_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run ABT graph coloring on the k-core of the graph, one run per '
+                                                 'component, and color the peeled nodes back in')
+    parser.add_argument('--example', type=int, default=2)
+    parser.add_argument('--graph', default=None, help='edge list, DIMACS .col or .csr file to use instead of an example')
+    parser.add_argument('--colors', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-cycles', type=int, default=None)
+    parser.add_argument('--processes', type=int, default=1, help='number of components to solve at the same time')
+    parser.add_argument('--routing', choices=[DFS, SHORTEST_PATH], default=DFS)
+    parser.add_argument('--scheduler', choices=SCHEDULERS, default=SYNCHRONOUS)
+    parser.add_argument('--ordering', choices=ORDERINGS, default=INDEX, help='priority ordering of the agents')
+    args = parser.parse_args()
+
+    if args.graph is not None:
+        graph, initial_assignments = load_graph(args.graph), None
+    else:
+        graph, _, initial_assignments, _ = get_example(args.example)
+    result = solve(graph, args.colors, initial_assignments=initial_assignments, seed=args.seed,
+                   max_cycles=args.max_cycles, processes=args.processes, routing=args.routing,
+                   scheduler=args.scheduler, ordering=args.ordering)
+    for key, value in result.items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
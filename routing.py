@@ -0,0 +1,61 @@
+from collections import deque
+
+DFS = 'dfs'
+SHORTEST_PATH = 'shortest_path'
+
+
+class RoutingTable:
+    # Next hops shared by all agents, kept per target. The first time an agent needs a target it has no entry for, a
+    # BFS from that agent that stops as soon as it reaches the target finds a shortest path, and the next hop of every
+    # agent on that path is recorded, so the agents relaying the connection request only do lookups and the request
+    # travels along a shortest path. adjacency is a Graph or anything where adjacency[index] lists the neighbors of
+    # index.
+    def __init__(self, adjacency):
+        self.adjacency = adjacency
+        self.next_hops = {}
+        self.bfs_runs = 0
+
+    def next_hop(self, index, target_index):
+        next_hops = self.next_hops.setdefault(target_index, {})
+        if next_hops.get(index) is None:
+            self.bfs(index, target_index, next_hops)
+        return next_hops[index]
+
+    def add_edge(self, i, j):
+        # Recorded next hops stay valid since links are never removed, new links are only used by later searches. The
+        # adjacency is copied into lists the first time it changes
+        if not isinstance(self.adjacency, list):
+            self.adjacency = [list(self.adjacency[index]) for index in range(len(self.adjacency))]
+        while len(self.adjacency) <= max(i, j):
+            self.adjacency.append([])
+        if j not in self.adjacency[i]:
+            self.adjacency[i].append(j)
+            self.adjacency[j].append(i)
+
+    def bfs(self, source_index, target_index, next_hops):
+        self.bfs_runs += 1
+        parents = {source_index: source_index}
+        queue = deque([source_index])
+        while queue and target_index not in parents:
+            index = queue.popleft()
+            for neighbor_index in self.adjacency[index]:
+                if neighbor_index not in parents:
+                    parents[neighbor_index] = index
+                    queue.append(neighbor_index)
+        if target_index not in parents:
+            next_hops[source_index] = None
+            return
+        next_hops[target_index] = target_index
+        index = target_index
+        while index != source_index:
+            next_hops[parents[index]] = index
+            index = parents[index]
+
+    def path(self, source_index, target_index):
+        path = [source_index]
+        while path[-1] != target_index:
+            index = self.next_hop(path[-1], target_index)
+            if index is None:
+                return None
+            path.append(index)
+        return path
@@ -0,0 +1,119 @@
+import heapq
+import random
+from collections import deque
+
+SYNCHRONOUS = 'synchronous'
+READY_QUEUE = 'ready_queue'
+RANDOM = 'random'
+PRIORITY = 'priority'
+SCHEDULERS = [SYNCHRONOUS, READY_QUEUE, RANDOM, PRIORITY]
+
+
+# A scheduler decides which agents run next. It starts with every agent ready, since each has to pick its first value,
+# and is told through notify whenever an agent is sent a message. next_batch returns the agents to activate in the
+# next step, or an empty list once no agent has work left. With a synchronous scheduler the messages sent during a
+# step are delivered after the whole batch ran, with the others each agent's messages are delivered right away.
+
+class SynchronousScheduler:
+    # Every agent with pending work runs once per step, in index order, like the original synchronous cycles
+    policy = SYNCHRONOUS
+    synchronous = True
+
+    def __init__(self, agents):
+        self.ready = set(agents)
+
+    def notify(self, agent):
+        self.ready.add(agent)
+
+    def next_batch(self):
+        batch = sorted(self.ready, key=lambda agent: agent.index)
+        self.ready = set()
+        return batch
+
+
+class ReadyQueueScheduler:
+    # Agents run one at a time in the order they became ready
+    policy = READY_QUEUE
+    synchronous = False
+
+    def __init__(self, agents):
+        self.queue = deque(agents)
+        self.queued = set(agents)
+
+    def notify(self, agent):
+        if agent not in self.queued:
+            self.queued.add(agent)
+            self.queue.append(agent)
+
+    def next_batch(self):
+        if not self.queue:
+            return []
+        agent = self.queue.popleft()
+        self.queued.discard(agent)
+        return [agent]
+
+
+class RandomScheduler:
+    # Agents run one at a time, each picked at random among the ready ones
+    policy = RANDOM
+    synchronous = False
+
+    def __init__(self, agents, seed=None):
+        self.rng = random.Random(seed)
+        self.ready = list(agents)
+        self.queued = set(agents)
+
+    def notify(self, agent):
+        if agent not in self.queued:
+            self.queued.add(agent)
+            self.ready.append(agent)
+
+    def next_batch(self):
+        if not self.ready:
+            return []
+        position = self.rng.randrange(len(self.ready))
+        self.ready[position], self.ready[-1] = self.ready[-1], self.ready[position]
+        agent = self.ready.pop()
+        self.queued.discard(agent)
+        return [agent]
+
+
+class PriorityScheduler:
+    # Agents run one at a time in rounds: every agent ready when a round starts runs once, highest ABT priority (lowest
+    # rank) first, and agents that become ready meanwhile wait for the next round. Always running the highest priority
+    # ready agent instead lets two agents messaging each other starve all the others.
+    policy = PRIORITY
+    synchronous = False
+
+    def __init__(self, agents):
+        self.heap = []
+        self.waiting = list(agents)
+        self.queued = set(agents)
+
+    def notify(self, agent):
+        if agent not in self.queued:
+            self.queued.add(agent)
+            self.waiting.append(agent)
+
+    def next_batch(self):
+        if not self.heap:
+            if not self.waiting:
+                return []
+            self.heap = [(agent.rank, agent.index, agent) for agent in self.waiting]
+            heapq.heapify(self.heap)
+            self.waiting = []
+        _, _, agent = heapq.heappop(self.heap)
+        self.queued.discard(agent)
+        return [agent]
+
+
+def make_scheduler(policy, agents, seed=None):
+    if policy == SYNCHRONOUS:
+        return SynchronousScheduler(agents)
+    if policy == READY_QUEUE:
+        return ReadyQueueScheduler(agents)
+    if policy == RANDOM:
+        return RandomScheduler(agents, seed=seed)
+    if policy == PRIORITY:
+        return PriorityScheduler(agents)
+    raise ValueError(f'Unknown scheduler {policy}')
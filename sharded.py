@@ -0,0 +1,230 @@
+import argparse
+import multiprocessing
+import random
+import time
+from collections import Counter, deque
+
+from Agent import Agent, NO_SOLUTION
+from examples import get_example
+from graph import as_graph, load_graph
+from ordering import INDEX, ORDERINGS, make_ranks
+from routing import DFS, SHORTEST_PATH, RoutingTable
+from termination import verify_graph_coloring
+
+STEP = 'step'
+FINISH = 'finish'
+
+
+class RemoteAgent:
+    # Stands in for a neighbor that lives in another shard; agents only ever read its index, rank and no_sol
+    def __init__(self, index, rank):
+        self.index = index
+        self.rank = rank
+        self.no_sol = False
+
+
+def partition(adjacency, num_shards):
+    # Linear deterministic greedy streaming partitioning over a BFS order: each node joins the shard holding most of
+    # its already placed neighbors, discounted by how full that shard is
+    num_nodes = len(adjacency)
+    capacity = num_nodes / num_shards + 1
+    shards = [-1] * num_nodes
+    sizes = [0] * num_shards
+    for root in range(num_nodes):
+        if shards[root] != -1:
+            continue
+        queue = deque([root])
+        seen = {root}
+        while queue:
+            index = queue.popleft()
+            placed = Counter(shards[neighbor] for neighbor in adjacency[index] if shards[neighbor] != -1)
+            shard = max(range(num_shards),
+                        key=lambda s: (placed[s] * (1 - sizes[s] / capacity), -sizes[s]))
+            shards[index] = shard
+            sizes[shard] += 1
+            for neighbor in adjacency[index]:
+                if shards[neighbor] == -1 and neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    return shards
+
+
+def cut_edges(adjacency, shards):
+    return sum(1 for i in range(len(adjacency)) for j in adjacency[i] if i < j and shards[i] != shards[j])
+
+
+def run_shard(connection, shard, shards, adjacency, num_colors, initial_assignments, routing, ranks, agent_options):
+    options = list(range(num_colors))
+    agents = {index: Agent(index, options, initial_assignment=initial_assignments[index],
+                           **agent_options)
+              for index in range(len(adjacency)) if shards[index] == shard}
+    remote_agents = {}
+    router = RoutingTable(adjacency) if routing == SHORTEST_PATH else None
+    for index, agent in agents.items():
+        neighbors = []
+        for neighbor_index in adjacency[index]:
+            if neighbor_index in agents:
+                neighbors.append(agents[neighbor_index])
+            else:
+                neighbor_rank = ranks[neighbor_index] if ranks is not None else neighbor_index
+                neighbors.append(remote_agents.setdefault(neighbor_index, RemoteAgent(neighbor_index, neighbor_rank)))
+        agent.set_neighbors(neighbors)
+        if router is not None:
+            agent.set_router(router)
+        if ranks is not None:
+            agent.set_ranks(ranks)
+
+    local = []
+    message_counts = Counter()
+    while True:
+        command, incoming = connection.recv()
+        if command == FINISH:
+            connection.send(({index: agent.number for index, agent in agents.items()},
+                             any(agent.no_sol for agent in agents.values()),
+                             dict(message_counts),
+                             dict(sum((agent.stats for agent in agents.values()), Counter()))))
+            return
+        # Deliver in the order of the sending agents so a run matches the single process Simulation exactly
+        inbox = local + incoming
+        inbox.sort(key=lambda entry: entry[0])
+        for source_index, target_index, message in inbox:
+            if message[0] == NO_SOLUTION and source_index in remote_agents:
+                remote_agents[source_index].no_sol = True
+            agents[target_index].message(message)
+        local = []
+        outgoing = {}
+        for index in sorted(agents):
+            agent = agents[index]
+            if not agent.messages and agent.number is not None:
+                continue
+            for envelope in agent.process_messages():
+                message_counts[envelope.message[0]] += 1
+                entry = (index, envelope.agent.index, envelope.message)
+                if envelope.agent.index in agents:
+                    local.append(entry)
+                else:
+                    outgoing.setdefault(shards[envelope.agent.index], []).append(entry)
+        connection.send((outgoing, len(local), any(agent.no_sol for agent in agents.values())))
+
+
+class ShardedSimulation:
+    def __init__(self, graph, num_colors, num_shards=None, initial_assignments=None, seed=None, routing=DFS,
+                 ordering=INDEX, **agent_options):
+        if num_shards is None:
+            num_shards = multiprocessing.cpu_count()
+        num_shards = max(1, min(num_shards, len(graph)))
+        if initial_assignments is None:
+            rng = random.Random(seed)
+            initial_assignments = [rng.randint(0, num_colors - 1) for _ in range(len(graph))]
+        self.graph = graph
+        self.num_colors = num_colors
+        self.num_shards = num_shards
+        self.shards = partition(graph, num_shards)
+        ranks = make_ranks(ordering, graph)
+        self.cycle = 0
+        self.local_messages = 0
+        self.cross_shard_messages = 0
+        self.connections = []
+        self.processes = []
+        for shard in range(num_shards):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_shard,
+                                              args=(child_connection, shard, self.shards, graph, num_colors,
+                                                    initial_assignments, routing, ranks, agent_options))
+            process.start()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def run(self, max_cycles=None):
+        start = time.perf_counter()
+        inboxes = [[] for _ in range(self.num_shards)]
+        no_sol = False
+        while max_cycles is None or self.cycle < max_cycles:
+            for shard, connection in enumerate(self.connections):
+                connection.send((STEP, inboxes[shard]))
+            inboxes = [[] for _ in range(self.num_shards)]
+            pending = 0
+            for connection in self.connections:
+                outgoing, local_count, shard_no_sol = connection.recv()
+                no_sol = no_sol or shard_no_sol
+                pending += local_count
+                self.local_messages += local_count
+                for shard, batch in outgoing.items():
+                    inboxes[shard].extend(batch)
+                    pending += len(batch)
+                    self.cross_shard_messages += len(batch)
+            self.cycle += 1
+            # The coordinator counts the messages still to be delivered, so it knows exactly when the run is quiescent,
+            # and a run also ends as soon as any agent learns there is no solution
+            if pending == 0 or no_sol:
+                break
+        wall_time = time.perf_counter() - start
+        return self.finish(no_sol, wall_time)
+
+    def finish(self, no_sol, wall_time):
+        coloring = [None] * len(self.graph)
+        message_counts = Counter()
+        agent_stats = Counter()
+        for connection in self.connections:
+            connection.send((FINISH, None))
+        for connection in self.connections:
+            numbers, shard_no_sol, shard_message_counts, shard_agent_stats = connection.recv()
+            for index, number in numbers.items():
+                coloring[index] = number
+            no_sol = no_sol or shard_no_sol
+            message_counts.update(shard_message_counts)
+            agent_stats.update(shard_agent_stats)
+        for process in self.processes:
+            process.join()
+        total = self.local_messages + self.cross_shard_messages
+        converged = not no_sol and verify_graph_coloring(self.graph, coloring, self.num_colors)
+        return {
+            'coloring': None if no_sol else coloring,
+            'no_solution': no_sol,
+            'converged': converged,
+            'time_to_convergence': wall_time if converged else None,
+            'cycles': self.cycle,
+            'messages': total,
+            'message_counts': dict(message_counts),
+            'agent_stats': dict(agent_stats),
+            'shards': self.num_shards,
+            'cut_edges': cut_edges(self.graph, self.shards),
+            'cross_shard_messages': self.cross_shard_messages,
+            'cross_shard_ratio': self.cross_shard_messages / total if total else 0.0,
+            'wall_time': wall_time,
+        }
+
+
+def solve(graph, num_colors, num_shards=None, initial_assignments=None, seed=None, max_cycles=None,
+          routing=DFS, ordering=INDEX, **agent_options):
+    simulation = ShardedSimulation(as_graph(graph), num_colors, num_shards=num_shards,
+                                   initial_assignments=initial_assignments, seed=seed, routing=routing,
+                                   ordering=ordering, **agent_options)
+    return simulation.run(max_cycles=max_cycles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run ABT graph coloring with the agents split across processes')
+    parser.add_argument('--example', type=int, default=2)
+    parser.add_argument('--graph', default=None, help='edge list, DIMACS .col or .csr file to use instead of an example')
+    parser.add_argument('--colors', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-cycles', type=int, default=None)
+    parser.add_argument('--routing', choices=[DFS, SHORTEST_PATH], default=DFS)
+    parser.add_argument('--ordering', choices=ORDERINGS, default=INDEX, help='priority ordering of the agents')
+    args = parser.parse_args()
+
+    if args.graph is not None:
+        graph, initial_assignments = load_graph(args.graph), None
+    else:
+        graph, _, initial_assignments, _ = get_example(args.example)
+    result = solve(graph, args.colors, num_shards=args.shards, initial_assignments=initial_assignments,
+                   seed=args.seed, max_cycles=args.max_cycles, routing=args.routing,
+                   ordering=args.ordering)
+    for key, value in result.items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
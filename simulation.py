@@ -0,0 +1,328 @@
+import argparse
+import random
+import time
+from collections import Counter
+from itertools import chain
+
+from Agent import Agent
+from examples import get_example
+from graph import as_graph, load_graph
+from messages import OK, Envelope
+from nogood_store import OLDEST, LARGEST
+from ordering import INDEX, ORDERINGS, make_ranks
+from recording import NO_SOLUTION_VALUE, TraceWriter
+from routing import DFS, SHORTEST_PATH, RoutingTable
+from scheduling import SCHEDULERS, SYNCHRONOUS, SynchronousScheduler, make_scheduler
+from termination import TerminationDetector
+from tracing import LEVELS, JsonlSink, PrintSink, Tracer
+
+
+def build_agents(graph, num_colors, initial_assignments=None, seed=None, routing=DFS, ordering=INDEX,
+                 **agent_options):
+    graph = as_graph(graph)
+    rng = random.Random(seed)
+    # Every agent shares the same options list
+    options = list(range(num_colors))
+    agents = []
+    for i in range(len(graph)):
+        if initial_assignments is not None:
+            initial_assignment = initial_assignments[i]
+        else:
+            initial_assignment = rng.randint(0, num_colors - 1)
+        agents.append(Agent(i, options, initial_assignment=initial_assignment, **agent_options))
+    for i in range(len(graph)):
+        agents[i].set_neighbors([agents[j] for j in graph[i]])
+    if routing == SHORTEST_PATH:
+        router = RoutingTable(graph)
+        for agent in agents:
+            agent.set_router(router)
+    ranks = make_ranks(ordering, graph)
+    if ranks is not None:
+        for agent in agents:
+            agent.set_ranks(ranks)
+    return agents
+
+
+class Simulation:
+    def __init__(self, agents, recorder=None, scheduler=None):
+        self.agents = agents
+        self.recorder = recorder
+        self.scheduler = scheduler if scheduler is not None else SynchronousScheduler(agents)
+        self.cycle = 0
+        self.activations = 0
+        self.nccc = 0
+        # Logical clocks of constraint checks for schedulers that deliver right away: an agent's clock is the most
+        # checks any chain of activations leading up to its current state needed, and the largest clock is the NCCC
+        self.clocks = {}
+        self.arrivals = {}
+        self.message_counts = Counter()
+        self.sent = []
+        self.detector = TerminationDetector(agents)
+
+    def deliver(self, messages):
+        for msg in messages:
+            self.message_counts[msg.message[0]] += 1
+            msg.agent.message(msg.message)
+            self.scheduler.notify(msg.agent)
+        if self.recorder is not None:
+            for msg in messages:
+                self.recorder.message(msg.source.index, msg.agent.index, msg.message_type)
+
+    def step(self):
+        # One step of the scheduler. With the synchronous scheduler this is a cycle in which every agent with pending
+        # work is activated once and everything sent during the cycle is delivered at its end; other schedulers
+        # activate a single agent per step and deliver what it sent right away
+        ready = self.scheduler.next_batch()
+        if not ready:
+            return False
+        self.cycle += 1
+        if self.recorder is not None:
+            self.recorder.cycle(self.cycle)
+        outgoing = []
+        # Agents run concurrently within a cycle, so only the busiest one adds to the non-concurrent constraint checks
+        cycle_checks = 0
+        for agent in ready:
+            constraint_checks = agent.constraint_checks
+            number, no_sol = agent.number, agent.no_sol
+            self.detector.activating(agent)
+            messages = agent.process_messages()
+            self.detector.activated(agent, messages)
+            if self.scheduler.synchronous:
+                outgoing.extend(messages)
+                cycle_checks = max(cycle_checks, agent.constraint_checks - constraint_checks)
+            else:
+                clock = max(self.clocks.get(agent.index, 0), self.arrivals.pop(agent.index, 0))
+                clock += agent.constraint_checks - constraint_checks
+                self.clocks[agent.index] = clock
+                self.nccc = max(self.nccc, clock)
+                for msg in messages:
+                    self.arrivals[msg.agent.index] = max(self.arrivals.get(msg.agent.index, 0), clock)
+                outgoing.extend(messages)
+            self.activations += 1
+            if self.recorder is not None:
+                if agent.no_sol and not no_sol:
+                    self.recorder.assignment(agent.index, NO_SOLUTION_VALUE)
+                elif agent.number != number:
+                    self.recorder.assignment(agent.index, agent.number)
+        self.nccc += cycle_checks
+        self.deliver(outgoing)
+        self.sent = outgoing
+        return True
+
+    # Changes to the problem, applied to a running or finished run between steps. They keep every value, agent_view and
+    # link and only message the agents they touch. Nogoods stay valid when constraints are added, by new edges, new
+    # nodes or fewer options, and when constraints are removed only the nogoods that could depend on them are dropped
+    def add_edge(self, i, j):
+        high, low = self.by_rank(i, j)
+        if low.index in high.neighbor_indices:
+            return
+        self.link(high, low)
+        high.add_constraint(low)
+        low.add_constraint(high)
+        # Only the lower priority agent checks the constraint, and the OK makes it do so
+        if high.number is not None and not self.detector.no_solution:
+            self.inject([Envelope(high, low, (OK, (high.index, high.number)))])
+        self.detector.resume()
+
+    def remove_edge(self, i, j):
+        # The link stays, since links in ABT are never removed, so paths relaying messages over it remain usable
+        high, low = self.by_rank(i, j)
+        if low.index not in high.neighbor_indices:
+            return
+        high.remove_constraint(low.index)
+        low.remove_constraint(high.index)
+        self.relax([low])
+        self.detector.resume()
+
+    def add_node(self, neighbors, options=None, initial_assignment=None):
+        # The new agent gets the lowest priority and the settings of the existing ones, and returns its index
+        if self.recorder is not None:
+            raise ValueError('Agents cannot be added to a recorded run')
+        template = self.agents[0]
+        index = len(self.agents)
+        agent = Agent(index, list(options) if options is not None else template.options,
+                      verbose=template.verbose, initial_assignment=initial_assignment,
+                      minimize_no_goods=template.minimize_no_goods, forget_no_goods=template.no_goods.forget_obsolete,
+                      max_no_goods=template.no_goods.max_size, no_good_eviction=template.no_goods.eviction,
+                      coalesce_ok=template.coalesce_ok, tracer=template.tracer)
+        agent.set_neighbors([])
+        if template.router is not None:
+            agent.set_router(template.router)
+        if template.ranks is not None:
+            template.ranks.append(len(template.ranks))
+            agent.set_ranks(template.ranks)
+        self.agents.append(agent)
+        self.scheduler.notify(agent)
+        for neighbor_index in neighbors:
+            self.add_edge(index, neighbor_index)
+        self.detector.resume(added=1)
+        return index
+
+    def remove_node(self, index):
+        # The agent no longer constrains anyone but keeps relaying messages for the links that go through it
+        agent = self.agents[index]
+        lows = []
+        for neighbor_index in list(agent.neighbor_indices):
+            high, low = self.by_rank(index, neighbor_index)
+            high.remove_constraint(low.index)
+            low.remove_constraint(high.index)
+            lows.append(low)
+        self.relax(lows)
+        self.detector.resume()
+
+    def set_options(self, options, indices=None):
+        # Changes the options of the agents at indices, or of every agent
+        agents = self.agents if indices is None else [self.agents[index] for index in indices]
+        options = list(options)
+        relaxed = [agent for agent in agents if not set(options) <= set(agent.options)]
+        for agent in agents:
+            agent.set_options(options)
+        self.relax(relaxed)
+        if not self.detector.no_solution:
+            for agent in agents:
+                number = agent.number
+                self.inject(agent.revise())
+                if self.recorder is not None and agent.number != number:
+                    self.recorder.assignment(agent.index, agent.number)
+        self.detector.resume()
+
+    def by_rank(self, i, j):
+        if i == j:
+            raise ValueError(f'Agent {i} cannot be constrained by itself')
+        first, second = self.agents[i], self.agents[j]
+        return (first, second) if first.rank < second.rank else (second, first)
+
+    def link(self, first, second):
+        router = first.router
+        if router is not None and second.index not in first.neighbor_map:
+            router.add_edge(first.index, second.index)
+
+    def relax(self, lows):
+        # A constraint is only checked by its lower priority agent and a nogood only ever goes to a higher priority
+        # agent its sender is linked to, so a nogood derived from a removed constraint can only be stored by an agent
+        # reached from the lower priority ends of the removed constraints through such links. Those agents drop their
+        # nogoods and all others keep theirs. A no solution may not hold any more either, so then every agent resumes
+        reached = set()
+        stack = list(lows)
+        while stack:
+            agent = stack.pop()
+            for index in chain(agent.neighbor_map, agent.indirect_neighbors):
+                if index not in reached and agent.rank_of(index) < agent.rank:
+                    reached.add(index)
+                    stack.append(self.agents[index])
+        for index in reached:
+            self.agents[index].no_goods.clear()
+        if lows and self.detector.no_solution:
+            messages = []
+            for agent in self.agents:
+                waiting = len(agent.messages)
+                messages.extend(agent.resume())
+                self.detector.dropped(waiting - len(agent.messages))
+            self.detector.resume(no_solution=False)
+            self.inject(messages)
+
+    def inject(self, messages):
+        self.detector.injected(messages)
+        self.deliver(messages)
+
+    def no_good_store_stats(self):
+        per_agent = [agent.no_goods.stats() for agent in self.agents]
+        return {
+            'size': sum(stats['size'] for stats in per_agent),
+            'peak_size': max((stats['peak_size'] for stats in per_agent), default=0),
+            'bytes': sum(stats['bytes'] for stats in per_agent),
+            'forgotten': sum(stats['forgotten'] for stats in per_agent),
+            'evicted': sum(stats['evicted'] for stats in per_agent),
+        }
+
+    def no_solution(self):
+        return any(agent.no_sol for agent in self.agents)
+
+    def run(self, max_cycles=None):
+        start = time.perf_counter()
+        while not self.detector.terminated() and (max_cycles is None or self.cycle < max_cycles):
+            if not self.step():
+                break
+        return self.result(time.perf_counter() - start)
+
+    def result(self, wall_time=None):
+        no_sol = self.no_solution()
+        return {
+            'coloring': None if no_sol else [agent.number for agent in self.agents],
+            'no_solution': no_sol,
+            'quiescent': self.detector.quiescent(),
+            'converged': self.detector.converged,
+            'time_to_convergence': self.detector.time_to_convergence,
+            'scheduler': self.scheduler.policy,
+            'cycles': self.cycle,
+            'activations': self.activations,
+            'constraint_checks': sum(agent.constraint_checks for agent in self.agents),
+            'nccc': self.nccc,
+            'messages': sum(self.message_counts.values()),
+            'message_counts': dict(self.message_counts),
+            'agent_stats': dict(sum((agent.stats for agent in self.agents), Counter())),
+            'no_good_store': self.no_good_store_stats(),
+            'wall_time': wall_time,
+        }
+
+
+def solve(graph, num_colors, initial_assignments=None, seed=None, max_cycles=None, record=None,
+          scheduler=SYNCHRONOUS, **agent_options):
+    # record is the path of a trace file to stream the run to, for replaying it later in main.py
+    agents = build_agents(graph, num_colors, initial_assignments=initial_assignments, seed=seed,
+                          **agent_options)
+    recorder = TraceWriter(record, len(agents)) if record is not None else None
+    result = Simulation(agents, recorder=recorder,
+                        scheduler=make_scheduler(scheduler, agents, seed=seed)).run(max_cycles=max_cycles)
+    if recorder is not None:
+        recorder.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run ABT graph coloring without the visualization')
+    parser.add_argument('--example', type=int, default=2)
+    parser.add_argument('--graph', default=None, help='edge list, DIMACS .col or .csr file to use instead of an example')
+    parser.add_argument('--colors', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-cycles', type=int, default=None)
+    parser.add_argument('--routing', choices=[DFS, SHORTEST_PATH], default=DFS)
+    parser.add_argument('--scheduler', choices=SCHEDULERS, default=SYNCHRONOUS)
+    parser.add_argument('--ordering', choices=ORDERINGS, default=INDEX, help='priority ordering of the agents')
+    parser.add_argument('--minimize-no-goods', action='store_true')
+    parser.add_argument('--forget-no-goods', action='store_true')
+    parser.add_argument('--coalesce-ok', action='store_true')
+    parser.add_argument('--max-no-goods', type=int, default=None,
+                        help='cap on the nogoods each agent stores; active ones are never evicted, so a store can '
+                             'stay above it while all of its nogoods are active')
+    parser.add_argument('--no-good-eviction', choices=[OLDEST, LARGEST], default=OLDEST)
+    parser.add_argument('--verbose', action='store_true', help='print every event')
+    parser.add_argument('--trace', default=None, help='file to write events to as JSON lines')
+    parser.add_argument('--trace-level', choices=list(LEVELS), default='debug')
+    parser.add_argument('--record', default=None, help='file to record messages and assignments to for replay')
+    args = parser.parse_args()
+
+    sinks = []
+    if args.verbose:
+        sinks.append(PrintSink())
+    if args.trace is not None:
+        sinks.append(JsonlSink(args.trace))
+    tracer = Tracer(LEVELS[args.trace_level], sinks) if sinks else None
+
+    if args.graph is not None:
+        graph, initial_assignments = load_graph(args.graph), None
+    else:
+        graph, _, initial_assignments, _ = get_example(args.example)
+    result = solve(graph, args.colors, initial_assignments=initial_assignments, seed=args.seed,
+                   max_cycles=args.max_cycles, record=args.record, routing=args.routing, tracer=tracer,
+                   scheduler=args.scheduler, ordering=args.ordering, minimize_no_goods=args.minimize_no_goods,
+                   forget_no_goods=args.forget_no_goods, max_no_goods=args.max_no_goods,
+                   no_good_eviction=args.no_good_eviction, coalesce_ok=args.coalesce_ok)
+    if tracer is not None:
+        tracer.close()
+    for key, value in result.items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
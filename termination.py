@@ -0,0 +1,87 @@
+import time
+
+
+def verify_coloring(agents):
+    # Checks the values the agents actually hold rather than their agent_views: every agent has one of its options
+    # and no two neighbors share a value
+    for agent in agents:
+        if agent.number is None or agent.number not in agent.option_bits:
+            return False
+        for index in agent.neighbor_indices:
+            if agent.neighbor_map[index].number == agent.number:
+                return False
+    return True
+
+
+def verify_graph_coloring(graph, coloring, num_colors):
+    # The same check for runtimes that only have the final values, like the sharded one
+    if any(number is None or not 0 <= number < num_colors for number in coloring):
+        return False
+    return all(coloring[i] != coloring[j] for i, j in graph.edges())
+
+
+class TerminationDetector:
+    # Detects termination by message counting. Every message is counted once when its sender hands it over and once
+    # when its receiver processes it, so while the two totals differ some message is still in flight or waiting in a
+    # mailbox. The run has terminated once they match and every agent has picked a value, since no agent can act again
+    # without being sent a message. It also ends as soon as any agent learns there is no solution. On termination the
+    # coloring is checked once and the time since the detector was created is kept as the time to convergence.
+    def __init__(self, agents):
+        self.agents = agents
+        self.sent = 0
+        self.processed = 0
+        self.unassigned = sum(1 for agent in agents if agent.number is None)
+        self.no_solution = False
+        self.start = time.perf_counter()
+        self.finished_at = None
+        self.verified = None
+
+    def activating(self, agent):
+        self.processed += len(agent.messages)
+        if agent.number is None:
+            self.unassigned -= 1
+
+    def activated(self, agent, messages):
+        self.sent += len(messages)
+        if agent.no_sol:
+            self.no_solution = True
+
+    def resume(self, added=0, no_solution=None):
+        # Called after the problem changed: the run goes on, with added more agents still to pick a value, and the time
+        # to convergence is measured from the change
+        self.unassigned += added
+        if no_solution is not None:
+            self.no_solution = no_solution
+        self.start = time.perf_counter()
+        self.finished_at = None
+        self.verified = None
+
+    def injected(self, messages):
+        # Messages sent because of a change to the problem rather than by an activation
+        self.sent += len(messages)
+
+    def dropped(self, count):
+        # Messages taken out of a mailbox without being processed
+        self.processed += count
+
+    def quiescent(self):
+        return self.sent == self.processed and self.unassigned == 0
+
+    def terminated(self):
+        if self.finished_at is not None:
+            return True
+        if not self.no_solution and not self.quiescent():
+            return False
+        self.finished_at = time.perf_counter()
+        self.verified = not self.no_solution and verify_coloring(self.agents)
+        return True
+
+    @property
+    def converged(self):
+        return bool(self.verified)
+
+    @property
+    def time_to_convergence(self):
+        if not self.converged:
+            return None
+        return self.finished_at - self.start
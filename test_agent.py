@@ -0,0 +1,53 @@
+from Agent import Agent
+from graph import Graph
+from messages import OK, INDIRECT
+from simulation import solve
+from termination import verify_graph_coloring
+
+
+def test_ok_goes_out_on_every_indirect_path():
+    agent = Agent(0, [0, 1, 2], initial_assignment=0)
+    agent.set_neighbors([Agent(1, [0, 1, 2]), Agent(2, [0, 1, 2])])
+    agent.add_indirect_neighbor(5, (1, 5))
+    agent.add_indirect_neighbor(5, (2, 5))
+    agent.number = 0
+    agent.new_messages = []
+    agent.send_value()
+    indirect = [msg for msg in agent.take_messages() if msg.message[0] == INDIRECT]
+    assert [msg.agent.index for msg in indirect] == [1, 2]
+    assert all(msg.message[1].message == (OK, (0, 0)) for msg in indirect)
+
+
+def test_messages_to_an_indirect_neighbor_use_its_first_path():
+    agent = Agent(0, [0, 1, 2])
+    agent.set_neighbors([Agent(1, [0, 1, 2]), Agent(2, [0, 1, 2])])
+    agent.add_indirect_neighbor(5, (1, 5))
+    agent.add_indirect_neighbor(5, (2, 5))
+    agent.new_messages = []
+    assert agent.send_indirect(5, (OK, (0, 1)))
+    [msg] = agent.take_messages()
+    assert msg.agent.index == 1
+
+
+def test_converges_with_several_paths_to_one_agent():
+    # Agent 10 learns of agent 2 over more than one path. With only the latest path kept it held on to a stale value
+    # for agent 2 and the run never settled
+    edges = [(0, 4), (0, 8), (0, 9), (0, 10), (1, 2), (1, 4), (1, 9), (2, 3), (2, 7), (2, 11), (3, 4), (3, 8), (4, 5),
+             (4, 6), (4, 7), (4, 9), (4, 11), (5, 8), (6, 7), (6, 8), (6, 10), (7, 10), (8, 10), (8, 11), (10, 11)]
+    graph = Graph.from_edges(12, edges)
+    result = solve(graph, 3, seed=17, max_cycles=2000)
+    assert result['converged']
+    assert verify_graph_coloring(graph, result['coloring'], 3)
+
+
+def test_take_messages_hands_over_the_sent_messages():
+    agent = Agent(0, [0, 1, 2], initial_assignment=1)
+    neighbor = Agent(1, [0, 1, 2])
+    agent.set_neighbors([neighbor])
+    sent = agent.process_messages()
+    assert [(msg.agent, msg.message) for msg in sent] == [(neighbor, (OK, (0, 1)))]
+    # The agent keeps nothing of what it handed over, so later messages go to a new list
+    assert agent.take_messages() == ()
+    agent.message((OK, (1, 1)))
+    agent.process_messages()
+    assert len(sent) == 1
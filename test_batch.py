@@ -0,0 +1,26 @@
+from batch import ERROR, SOLVED, read_instances, solve_batch
+
+
+def write_instances(tmp_path, lines):
+    path = tmp_path / 'instances.jsonl'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_read_instances_reports_malformed_lines(tmp_path):
+    path = write_instances(tmp_path, ['{"nodes": 2, "edges": [[0, 1]]}', '{"nodes": 2,', '[1, 2]'])
+    instances = list(read_instances(path))
+    assert instances[0] == {'id': 0, 'nodes': 2, 'edges': [[0, 1]]}
+    assert instances[1]['id'] == 1 and instances[1]['error'].startswith('line 2:')
+    assert instances[2]['id'] == 2 and instances[2]['error'].startswith('line 3:')
+
+
+def test_malformed_line_does_not_abort_the_batch(tmp_path):
+    path = write_instances(tmp_path, ['{"id": "a", "nodes": 3, "edges": [[0, 1], [1, 2]]}', 'not json',
+                                      '{"id": "b", "nodes": 2, "edges": [[0, 1]]}'])
+    rows = {row['id']: row for row in solve_batch(read_instances(path), 3, processes=1, seed=0,
+                                                   routing='shortest_path')}
+    assert rows['a']['status'] == SOLVED
+    assert rows['b']['status'] == SOLVED
+    assert rows[1]['status'] == ERROR
+    assert rows[1]['error'].startswith('line 2:')
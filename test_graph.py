@@ -0,0 +1,29 @@
+import pytest
+
+from graph import Graph, load_dimacs, load_edge_list
+
+
+def test_from_edges_builds_sorted_rows():
+    graph = Graph.from_edges(4, [(2, 0), (0, 1), (1, 0), (3, 3), (1, 2)])
+    assert [list(graph[index]) for index in range(4)] == [[1, 2], [0, 2], [0, 1], []]
+    assert graph.num_edges == 3
+
+
+@pytest.mark.parametrize('edge', [(0, 4), (-1, 2), (2, -1), (-1, -1)])
+def test_from_edges_rejects_nodes_out_of_range(edge):
+    with pytest.raises(ValueError):
+        Graph.from_edges(4, [(0, 1), edge])
+
+
+def test_load_dimacs_rejects_node_zero(tmp_path):
+    path = tmp_path / 'graph.col'
+    path.write_text('p edge 3 2\ne 1 2\ne 0 1\n')
+    with pytest.raises(ValueError):
+        load_dimacs(str(path))
+
+
+def test_load_one_indexed_edge_list_rejects_node_zero(tmp_path):
+    path = tmp_path / 'graph.txt'
+    path.write_text('1 2\n0 3\n')
+    with pytest.raises(ValueError):
+        load_edge_list(str(path), one_indexed=True)
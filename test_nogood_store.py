@@ -0,0 +1,95 @@
+from graph import Graph
+from nogood_store import NogoodStore
+from simulation import solve
+
+BITS = {0: 1, 1: 2, 2: 4}
+
+
+def test_nogood_is_active_only_while_its_pairs_hold():
+    store = NogoodStore(5, option_bits=BITS)
+    view = {1: 0}
+    store.add([(1, 0), (2, 1), (5, 2)], view)
+    assert not store.is_blocked(2)
+    store.update(2, None, 1)
+    assert store.is_blocked(2) and not store.is_blocked(0)
+    assert store.blocked_mask == BITS[2]
+    store.update(1, 0, 2)
+    assert not store.is_blocked(2)
+    assert store.blocked_mask == 0
+
+
+def test_nogood_without_the_owner_blocks_every_value():
+    store = NogoodStore(5, option_bits=BITS)
+    store.add([(1, 0), (2, 1)], {1: 0, 2: 1})
+    assert store.blocks_all == 1
+    assert all(store.is_blocked(number) for number in BITS)
+    store.update(2, 1, None)
+    assert store.blocks_all == 0
+
+
+def test_duplicate_nogoods_are_stored_once():
+    store = NogoodStore(5, option_bits=BITS)
+    assert store.add([(1, 0), (5, 1)], {}) is not None
+    assert store.add([(5, 1), (1, 0)], {}) is None
+    assert len(store) == 1
+
+
+def test_reasons_leave_out_the_owner():
+    store = NogoodStore(5, option_bits=BITS)
+    store.add([(1, 0), (3, 2), (5, 1)], {1: 0, 3: 2})
+    assert [sorted(reason) for reason in store.reasons(1)] == [[(1, 0), (3, 2)]]
+    assert list(store.reasons(0)) == []
+
+
+def test_clear_drops_every_nogood():
+    store = NogoodStore(5, option_bits=BITS)
+    store.add([(1, 0), (5, 1)], {1: 0})
+    store.clear()
+    assert len(store) == 0 and store.blocked_mask == 0 and not store.is_blocked(1)
+    store.add([(1, 0), (5, 2)], {1: 0})
+    assert store.is_blocked(2)
+
+
+def test_forget_obsolete_drops_nogoods_the_view_no_longer_matches():
+    store = NogoodStore(5, forget_obsolete=True, option_bits=BITS)
+    assert store.add([(1, 0), (5, 1)], {1: 2}) is None
+    store.add([(1, 0), (5, 1)], {1: 0})
+    store.update(1, 0, 2)
+    assert len(store) == 0
+    assert store.stats()['forgotten'] == 2
+
+
+def test_max_size_evicts_inactive_nogoods_first():
+    store = NogoodStore(5, max_size=2, option_bits=BITS)
+    view = {1: 0}
+    active = store.add([(1, 0), (5, 0)], view)
+    store.add([(2, 1), (5, 1)], view)
+    store.add([(3, 1), (5, 2)], view)
+    assert len(store) == 2
+    assert active in store.no_goods
+    assert store.is_blocked(0)
+    assert store.stats()['evicted'] == 1
+
+
+def test_max_size_never_evicts_active_nogoods():
+    store = NogoodStore(5, max_size=1, option_bits=BITS)
+    view = {1: 0, 2: 1}
+    store.add([(1, 0), (5, 0)], view)
+    store.add([(2, 1), (5, 1)], view)
+    assert len(store) == 2
+    assert store.is_blocked(0) and store.is_blocked(1)
+    assert store.stats()['evicted'] == 0
+    # Once one of them is no longer active the store shrinks back to the cap
+    store.update(2, 1, 2)
+    assert len(store) == 1
+    assert store.is_blocked(0) and not store.is_blocked(1)
+    assert store.stats()['evicted'] == 1
+
+
+def test_max_size_still_terminates_on_a_graph_without_solution():
+    edges = [(0, 2), (0, 3), (0, 5), (0, 8), (0, 9), (0, 10), (1, 2), (1, 3), (1, 6), (1, 7), (1, 8), (1, 9), (1, 10),
+             (2, 4), (2, 5), (2, 6), (2, 7), (2, 8), (3, 6), (3, 8), (3, 9), (3, 10), (4, 5), (4, 9), (4, 10), (5, 8),
+             (5, 10), (6, 7), (6, 8), (6, 9), (7, 8), (8, 9)]
+    graph = Graph.from_edges(11, edges)
+    for seed in range(3):
+        assert solve(graph, 4, seed=seed, max_cycles=3000, max_no_goods=2, forget_no_goods=True)['no_solution']
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from graph import Graph
+from ordering import DSATUR, INDEX, MAX_DEGREE, ORDERINGS, SMALLEST_LAST, make_order, make_ranks
+
+
+def random_graph(num_nodes, probability, seed):
+    rng = random.Random(seed)
+    return Graph.from_edges(num_nodes, [(i, j) for i in range(num_nodes) for j in range(i + 1, num_nodes)
+                                        if rng.random() < probability])
+
+
+@pytest.mark.parametrize('ordering', ORDERINGS)
+def test_orders_are_permutations(ordering):
+    graph = random_graph(30, 0.2, 0)
+    assert sorted(make_order(ordering, graph)) == list(range(30))
+
+
+def test_max_degree_puts_high_degrees_first():
+    graph = Graph.from_edges(5, [(0, 1), (1, 2), (1, 3), (3, 4)])
+    assert make_order(MAX_DEGREE, graph) == [1, 3, 0, 2, 4]
+
+
+def test_smallest_last_bounds_higher_priority_neighbors_by_the_degeneracy():
+    # A tree has degeneracy 1, so every node but the first gets exactly one higher priority neighbor
+    graph = Graph.from_edges(7, [(0, 1), (0, 2), (1, 3), (1, 4), (2, 5), (2, 6)])
+    ranks = make_ranks(SMALLEST_LAST, graph)
+    higher = [sum(ranks[neighbor] < ranks[index] for neighbor in graph[index]) for index in range(7)]
+    assert sorted(higher) == [0, 1, 1, 1, 1, 1, 1]
+
+
+def test_dsatur_order_colors_an_odd_cycle_with_three_colors():
+    graph = Graph.from_edges(5, [(0, 1), (1, 2), (2, 3), (3, 4), (4, 0)])
+    colors = {}
+    for index in make_order(DSATUR, graph):
+        used = {colors[neighbor] for neighbor in graph[index] if neighbor in colors}
+        colors[index] = min(set(range(5)) - used)
+    assert max(colors.values()) == 2
+
+
+def test_ranks_invert_the_order():
+    graph = random_graph(20, 0.3, 1)
+    order = make_order(DSATUR, graph)
+    ranks = make_ranks(DSATUR, graph)
+    assert [ranks[index] for index in order] == list(range(20))
+    assert make_ranks(INDEX, graph) is None
+
+
+def test_unknown_ordering():
+    with pytest.raises(ValueError):
+        make_order('alphabetical', Graph.from_edges(2, [(0, 1)]))
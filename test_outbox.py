@@ -0,0 +1,50 @@
+from Agent import Agent
+from graph import Graph
+from messages import OK, NO_GOOD, INDIRECT, Envelope, Route
+from outbox import coalesce_ok_messages
+from simulation import solve
+
+agents = [Agent(index, [0, 1, 2, 3]) for index in range(6)]
+
+
+def ok(source, target, number, announcer=None):
+    return Envelope(agents[source], agents[target], (OK, (source if announcer is None else announcer, number)))
+
+
+def indirect_ok(source, path, number, announcer=None):
+    message = (OK, (source if announcer is None else announcer, number))
+    return Envelope(agents[source], agents[path[0]], (INDIRECT, Route(path, 1, message)))
+
+
+def test_only_the_latest_ok_per_channel_is_kept():
+    first, no_good, last = ok(0, 1, 2), Envelope(agents[0], agents[1], (NO_GOOD, (0, []))), ok(0, 1, 3)
+    kept, suppressed = coalesce_ok_messages([first, no_good, ok(0, 2, 1), last])
+    assert kept == [no_good, kept[1], last]
+    assert kept[1].agent is agents[2]
+    assert suppressed == 1
+
+
+def test_oks_on_different_routes_are_all_kept():
+    # Each route is its own FIFO channel, so dropping the copy on one route could let an older value arrive last
+    envelopes = [indirect_ok(0, (1, 5), 2), indirect_ok(0, (2, 5), 2), ok(0, 5, 3), indirect_ok(0, (1, 5), 3)]
+    kept, suppressed = coalesce_ok_messages(envelopes)
+    assert kept == envelopes[1:]
+    assert suppressed == 1
+
+
+def test_relayed_oks_are_never_merged():
+    envelopes = [ok(0, 1, 2, announcer=4), ok(0, 1, 3, announcer=4), indirect_ok(0, (1, 5), 1, announcer=4),
+                 indirect_ok(0, (1, 5), 2, announcer=4)]
+    kept, suppressed = coalesce_ok_messages(envelopes)
+    assert kept == envelopes
+    assert suppressed == 0
+
+
+def test_coalescing_still_finds_no_solution():
+    # An 11-node graph that cannot be 4-colored. Merging OKs across routes or relays made some seeds run forever
+    edges = [(0, 2), (0, 3), (0, 5), (0, 8), (0, 9), (0, 10), (1, 2), (1, 3), (1, 6), (1, 7), (1, 8), (1, 9), (1, 10),
+             (2, 4), (2, 5), (2, 6), (2, 7), (2, 8), (3, 6), (3, 8), (3, 9), (3, 10), (4, 5), (4, 9), (4, 10), (5, 8),
+             (5, 10), (6, 7), (6, 8), (6, 9), (7, 8), (8, 9)]
+    graph = Graph.from_edges(11, edges)
+    for seed in (0, 1, 2, 6):
+        assert solve(graph, 4, seed=seed, max_cycles=3000, coalesce_ok=True)['no_solution']
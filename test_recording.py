@@ -0,0 +1,36 @@
+from recording import KEYFRAME_INTERVAL, TraceReader, TraceWriter
+
+
+def write_trace(path, num_cycles):
+    # Agent 0 takes the cycle number as its value in every cycle, agent 1 only in the first one
+    writer = TraceWriter(path, 2)
+    for cycle in range(num_cycles):
+        writer.cycle(cycle)
+        writer.assignment(0, cycle)
+        if cycle == 0:
+            writer.assignment(1, 7)
+        writer.message(0, 1, 'ok')
+    writer.close()
+
+
+def test_colors_at_seeks_both_ways(tmp_path):
+    path = str(tmp_path / 'run.trc')
+    num_cycles = KEYFRAME_INTERVAL * 2 + 10
+    write_trace(path, num_cycles)
+    reader = TraceReader(path)
+    assert reader.num_cycles == num_cycles
+    for cycle in (5, KEYFRAME_INTERVAL + 3, 2, num_cycles - 1, KEYFRAME_INTERVAL):
+        assert reader.colors_at(cycle) == (cycle, 7)
+    assert reader.read_cycle(3) == ([(0, 3)], [(0, 1, 'ok')])
+    reader.close()
+
+
+def test_changing_returned_colors_does_not_change_later_seeks(tmp_path):
+    path = str(tmp_path / 'run.trc')
+    write_trace(path, 20)
+    reader = TraceReader(path)
+    colors = list(reader.colors_at(4))
+    colors[1] = 3
+    assert reader.colors_at(4) == (4, 7)
+    assert reader.colors_at(5) == (5, 7)
+    reader.close()
@@ -0,0 +1,52 @@
+from graph import Graph
+from reduction import color_back, components, peel, solve, subgraph
+from termination import verify_graph_coloring
+
+
+def test_peel_keeps_only_the_k_core():
+    # A 4-clique with a path hanging off it: with 3 colors the path is peeled and the clique stays, with 4 colors
+    # every node has fewer than 4 neighbors and nothing is left
+    graph = Graph.from_edges(6, [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3), (3, 4), (4, 5)])
+    peeled, core = peel(graph, 3)
+    assert core == [0, 1, 2, 3]
+    assert sorted(peeled) == [4, 5]
+    peeled, core = peel(graph, 4)
+    assert core == []
+    assert sorted(peeled) == list(range(6))
+
+
+def test_components_and_subgraph():
+    graph = Graph.from_edges(6, [(0, 1), (1, 2), (3, 4), (4, 5), (2, 5)])
+    assert components(graph, [0, 1, 3, 4]) == [[0, 1], [3, 4]]
+    part = subgraph(graph, [1, 2, 5])
+    assert list(part.edges()) == [(0, 1), (1, 2)]
+
+
+def test_color_back_gives_peeled_nodes_free_colors():
+    graph = Graph.from_edges(4, [(0, 1), (1, 2), (2, 0), (2, 3)])
+    coloring = color_back(graph, [0, 1, 2, None], [3], 3)
+    assert verify_graph_coloring(graph, coloring, 3)
+
+
+def octahedron(first):
+    # Every pair of six nodes except three opposite ones: 4 neighbors each and 3-colorable
+    nodes = range(first, first + 6)
+    return [(i, j) for i in nodes for j in nodes if i < j and not (j == i + 1 and (i - first) % 2 == 0)]
+
+
+def test_solve_colors_the_whole_graph():
+    # Two octahedra joined by a path, with a tail on each
+    edges = octahedron(0) + octahedron(6) + [(5, 12), (12, 6), (0, 13), (11, 14)]
+    graph = Graph.from_edges(15, edges)
+    result = solve(graph, 3, seed=0, routing='shortest_path')
+    assert result['converged']
+    assert result['components'] == 2
+    assert result['peeled'] == 3
+    assert verify_graph_coloring(graph, result['coloring'], 3)
+
+
+def test_solve_reports_no_solution():
+    clique = [(i, j) for i in range(4) for j in range(i + 1, 4)]
+    result = solve(Graph.from_edges(5, clique + [(3, 4)]), 3, seed=0, routing='shortest_path')
+    assert result['no_solution']
+    assert result['coloring'] is None
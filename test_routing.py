@@ -0,0 +1,26 @@
+from graph import Graph
+from routing import RoutingTable
+
+
+def test_path_is_a_shortest_path():
+    # A ring of six nodes with a chord from 0 to 3
+    graph = Graph.from_edges(6, [(0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 0), (0, 3)])
+    router = RoutingTable(graph)
+    assert router.path(1, 4) in ([1, 0, 3, 4], [1, 2, 3, 4])
+    assert router.path(0, 3) == [0, 3]
+
+
+def test_hops_found_once_are_reused():
+    graph = Graph.from_edges(4, [(0, 1), (1, 2), (2, 3)])
+    router = RoutingTable(graph)
+    assert router.path(0, 3) == [0, 1, 2, 3]
+    assert router.path(1, 3) == [1, 2, 3]
+    assert router.bfs_runs == 1
+
+
+def test_unreachable_target_is_searched_again_after_a_new_edge():
+    graph = Graph.from_edges(4, [(0, 1), (2, 3)])
+    router = RoutingTable(graph)
+    assert router.next_hop(0, 3) is None
+    router.add_edge(1, 2)
+    assert router.path(0, 3) == [0, 1, 2, 3]
@@ -0,0 +1,30 @@
+from Agent import Agent
+from graph import Graph
+from scheduling import PriorityScheduler
+from simulation import solve
+
+
+def test_priority_rounds_run_every_ready_agent():
+    agents = [Agent(index, [0, 1]) for index in range(3)]
+    scheduler = PriorityScheduler(agents)
+    assert scheduler.next_batch() == [agents[0]]
+    # Agent 0 got mail again, but agents 1 and 2 were ready first
+    scheduler.notify(agents[0])
+    assert scheduler.next_batch() == [agents[1]]
+    assert scheduler.next_batch() == [agents[2]]
+    assert scheduler.next_batch() == [agents[0]]
+    assert scheduler.next_batch() == []
+
+
+def test_priority_converges_when_high_priority_agents_keep_messaging():
+    edges = [(0, 7), (1, 2), (1, 3), (1, 4), (1, 7), (2, 4), (2, 5), (2, 7), (2, 8), (2, 9), (2, 10), (3, 5), (4, 6),
+             (5, 6), (5, 7), (5, 8), (5, 9), (6, 7), (6, 9), (7, 9), (7, 10)]
+    result = solve(Graph.from_edges(11, edges), 4, seed=11, scheduler='priority', ordering='max_degree',
+                   max_cycles=5000)
+    assert result['converged']
+
+
+def test_priority_finds_no_solution():
+    edges = [(0, 1), (0, 3), (0, 5), (0, 6), (1, 3), (2, 4), (2, 6), (3, 4), (3, 5), (3, 6), (4, 5), (5, 6)]
+    result = solve(Graph.from_edges(7, edges), 3, seed=8, scheduler='priority', max_cycles=5000)
+    assert result['no_solution']
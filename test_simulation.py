@@ -0,0 +1,89 @@
+from graph import Graph
+from simulation import Simulation, build_agents
+from termination import verify_coloring
+
+CLIQUE = [(i, j) for i in range(4) for j in range(i + 1, 4)]
+
+
+def simulation(num_nodes, edges, num_colors, seed=0):
+    agents = build_agents(Graph.from_edges(num_nodes, edges), num_colors, seed=seed, routing='shortest_path')
+    return Simulation(agents)
+
+
+def settles(sim):
+    result = sim.run(max_cycles=2000)
+    assert result['converged']
+    assert verify_coloring(sim.agents)
+    return result
+
+
+def test_add_edge_between_agents_with_the_same_color():
+    sim = simulation(4, [(0, 1), (1, 2), (2, 3)], 3)
+    settles(sim)
+    i, j = next((i, j) for i in range(4) for j in range(i + 2, 4) if sim.agents[i].number == sim.agents[j].number)
+    sim.add_edge(i, j)
+    assert j in sim.agents[i].neighbor_indices
+    settles(sim)
+    assert sim.agents[i].number != sim.agents[j].number
+
+
+def test_remove_edge_after_no_solution_restarts_the_agents():
+    sim = simulation(4, CLIQUE, 3)
+    assert sim.run(max_cycles=2000)['no_solution']
+    assert any(len(agent.no_goods) for agent in sim.agents)
+    sim.remove_edge(2, 3)
+    assert not any(agent.no_sol for agent in sim.agents)
+    # The nogoods agent 3 sent up could all depend on the removed constraint, so every agent it reaches drops its own
+    assert not any(len(agent.no_goods) for agent in sim.agents[:3])
+    result = settles(sim)
+    assert not result['no_solution']
+    assert sim.agents[2].number == sim.agents[3].number
+
+
+def test_remove_edge_only_clears_the_nogoods_it_could_have_caused():
+    # Nogoods only travel to higher priority agents, so removing the edge between 0 and 1 can only have caused nogoods
+    # stored by agent 0, never ones stored further down the path
+    sim = simulation(4, [(0, 1), (1, 2), (2, 3)], 2)
+    settles(sim)
+    sim.agents[0].no_goods.add([(1, 0), (0, 1)], sim.agents[0].agent_view)
+    sim.agents[2].no_goods.add([(1, 0), (2, 1)], sim.agents[2].agent_view)
+    sim.remove_edge(0, 1)
+    assert len(sim.agents[0].no_goods) == 0
+    assert len(sim.agents[2].no_goods) == 1
+    settles(sim)
+
+
+def test_add_node():
+    sim = simulation(4, [(0, 1), (1, 2), (2, 3)], 3)
+    settles(sim)
+    index = sim.add_node([0, 1, 2])
+    assert index == 4
+    settles(sim)
+    assert len({sim.agents[i].number for i in (0, 1, 4)}) == 3
+
+
+def test_remove_node_after_no_solution():
+    sim = simulation(4, CLIQUE, 3)
+    assert sim.run(max_cycles=2000)['no_solution']
+    sim.remove_node(0)
+    assert not sim.agents[1].neighbor_indices & {0}
+    result = settles(sim)
+    assert not result['no_solution']
+
+
+def test_set_options_with_fewer_colors():
+    # An even cycle still fits in two of the three colors
+    sim = simulation(6, [(i, (i + 1) % 6) for i in range(6)], 3)
+    settles(sim)
+    sim.set_options([1, 2])
+    settles(sim)
+    assert {agent.number for agent in sim.agents} == {1, 2}
+
+
+def test_set_options_with_more_colors_after_no_solution():
+    sim = simulation(4, CLIQUE, 3)
+    assert sim.run(max_cycles=2000)['no_solution']
+    sim.set_options([0, 1, 2, 3])
+    result = settles(sim)
+    assert not result['no_solution']
+    assert sorted(agent.number for agent in sim.agents) == [0, 1, 2, 3]
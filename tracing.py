@@ -0,0 +1,84 @@
+import json
+
+OFF = 0
+INFO = 1
+DEBUG = 2
+LEVELS = {'off': OFF, 'info': INFO, 'debug': DEBUG}
+
+RECEIVED = 'received'
+ACTIVATED = 'activated'
+INITIAL_VALUE = 'initial_value'
+OK_SENT = 'ok_sent'
+OK_RECEIVED = 'ok_received'
+NO_GOOD_RECEIVED = 'no_good_received'
+NO_GOOD_SENT = 'no_good_sent'
+CONSISTENT = 'consistent'
+INCONSISTENT = 'inconsistent'
+VALUE_CHANGED = 'value_changed'
+BACKTRACK = 'backtrack'
+CONNECTION_REQUEST_SENT = 'connection_request_sent'
+CONNECTION_REQUEST_RECEIVED = 'connection_request_received'
+CONNECTION_REQUEST_FORWARDED = 'connection_request_forwarded'
+CONNECTION_ESTABLISHED = 'connection_established'
+NO_SOLUTION_FOUND = 'no_solution_found'
+
+TEMPLATES = {
+    RECEIVED: 'Agent {agent} received {message}',
+    ACTIVATED: '=' * 100 + '\nProcessing Agent {agent}\n' + '=' * 100,
+    INITIAL_VALUE: 'Agent {agent} assigned itself {number}',
+    OK_SENT: 'Sent agent {target} message ({agent}, {number})',
+    OK_RECEIVED: 'Agent {agent} processing ok message ({source}, {number}) - agent_view is now {agent_view}',
+    NO_GOOD_RECEIVED: 'Agent {agent} processing no_good {no_good}',
+    NO_GOOD_SENT: 'Agent {agent} sending no_good {no_good} to Agent {target}',
+    CONSISTENT: 'Agent {agent} with number {number} is consistent with agent_view {agent_view}',
+    INCONSISTENT: 'Agent {agent} with number {number} is inconsistent with agent_view {agent_view}',
+    VALUE_CHANGED: 'Agent {agent} assigned new value {number}',
+    BACKTRACK: 'Agent {agent} has no value consistent with agent_view {agent_view} - Backtracking',
+    CONNECTION_REQUEST_SENT: 'Agent {agent} sending connection_request to Agent {target} through Agent {hop}',
+    CONNECTION_REQUEST_RECEIVED: 'Agent {agent} processing connection_request - target={target}, source={source}, '
+                                 'path={path}, visited={visited}',
+    CONNECTION_REQUEST_FORWARDED: 'Agent {agent} transferring connection_request with target Agent {target} to '
+                                  'Agent {hop} - path={path}, visited={visited}',
+    CONNECTION_ESTABLISHED: 'Connection between Agent {agent} and Agent {target} successful',
+    NO_SOLUTION_FOUND: 'Agent {agent} found that there is no solution',
+}
+
+
+class PrintSink:
+    # Formats events with their templates, the way verbose agents used to print them
+    def write(self, event, fields):
+        print(TEMPLATES[event].format(**fields))
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    # One JSON object per event with its name and fields. Values json cannot encode, like routes, are written as repr
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, event, fields):
+        self.file.write(json.dumps({'event': event, **fields}, default=repr) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class Tracer:
+    # Agents compare their trace_level with an event's level before building its fields, so nothing is formatted or
+    # even collected for events that are switched off. Events are only turned into text or JSON by the sinks
+    def __init__(self, level=INFO, sinks=None):
+        self.level = level
+        self.sinks = sinks if sinks is not None else [PrintSink()]
+
+    def emit(self, event, **fields):
+        for sink in self.sinks:
+            sink.write(event, fields)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+DISABLED = Tracer(OFF, [])